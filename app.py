@@ -1,16 +1,50 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, send_from_directory, Response
+from flask.json.provider import DefaultJSONProvider
 import json
+import orjson
+import hashlib
+import time
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from sqlalchemy import text
+from sqlalchemy import text, select
 import os
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from werkzeug.utils import secure_filename
 from config import config
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, falling back to Flask's serializer for unsupported types"""
+    
+    # Datetimes pass through to the default serializer so responses keep their existing format
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def dumps(self, obj, **kwargs):
+        options = self.options
+        if kwargs.get('sort_keys', self.sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=options).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build the response body as bytes directly, skipping the str -> bytes re-encode"""
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self.options | orjson.OPT_APPEND_NEWLINE
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            options |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=options),
+            mimetype=self.mimetype
+        )
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Load configuration
 config_name = os.environ.get('FLASK_ENV', 'development')
@@ -25,7 +59,7 @@ db.init_app(app)
 migrate.init_app(app, db)
 
 # Import and create models after db is initialized
-from models import create_models
+from models import create_models, bulk_insert, select_dicts
 Receipt, ProcessingJob, Subsidiary, StripeTransaction, CashbookTransaction, LookerCashbookTransaction, MatchedTransaction, ReconciliationResults, JournalTransaction, FPDataset, FPJournalRow, FPWorkingRow, FPSummitInstallment, FPProcessedJournal, FPMatchResult, FPDatasetEU, FPJournalRowEU, FPSummitInstallmentEU, FPMatchResultEU, FPProcessedJournalEU = create_models(db)
 
 # Register Journals Processing Blueprint
@@ -53,6 +87,15 @@ globals()['JournalTransaction'] = JournalTransaction
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Cache directory for generated journal ZIP files
+JOURNALS_CACHE_FOLDER = os.path.join(app.config['UPLOAD_FOLDER'], 'journals_cache')
+os.makedirs(JOURNALS_CACHE_FOLDER, exist_ok=True)
+
+@lru_cache(maxsize=8192)
+def parse_tx_date(value, fmt):
+    """datetime.strptime for stored dd/mm/yyyy transaction dates, cached as a job repeats the same few dates"""
+    return datetime.strptime(value, fmt)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -288,8 +331,10 @@ def upload_looker_cashbook_excel(job_id):
             LookerCashbookTransaction.query.filter_by(job_id=job_id).delete()
             
             # Insert new transactions
+            transactions = []
             transactions_added = 0
             from datetime import datetime  # Move import outside try block
+            uploaded_at = datetime.utcnow()  # One upload timestamp for every row
             
             for _, row in df.iterrows():
                 # Convert payment date to dd/mm/yyyy format
@@ -314,7 +359,7 @@ def upload_looker_cashbook_excel(job_id):
                         except:
                             payment_date_str = str(row.get('Payment Date'))
                 
-                transaction = LookerCashbookTransaction(
+                transactions.append(dict(
                     job_id=job_id,
                     unnamed_index=int(row.get('Unnamed: 0')) if pd.notna(row.get('Unnamed: 0')) else None,
                     payment_date=payment_date_str,
@@ -333,11 +378,11 @@ def upload_looker_cashbook_excel(job_id):
                     sepa_provider=str(row.get('SEPA Provider', '')) if pd.notna(row.get('SEPA Provider')) else None,
                     stripe_charge_id=str(row.get('Stripechargeid', '')) if pd.notna(row.get('Stripechargeid')) else None,
                     filename=file.filename,
-                    uploaded_at=datetime.utcnow()
-                )
-                db.session.add(transaction)
+                    uploaded_at=uploaded_at
+                ))
                 transactions_added += 1
             
+            bulk_insert(db, LookerCashbookTransaction, transactions)
             db.session.commit()
             
             return jsonify({
@@ -356,11 +401,13 @@ def upload_looker_cashbook_excel(job_id):
 @app.route('/api/looker-cashbook-transactions/<int:job_id>')
 def get_looker_cashbook_transactions(job_id):
     """Get Looker Cashbook transactions for a specific job"""
-    transactions = LookerCashbookTransaction.query.filter_by(
-        job_id=job_id
-    ).order_by(LookerCashbookTransaction.uploaded_at.desc()).all()
+    transactions = select_dicts(
+        db, LookerCashbookTransaction,
+        LookerCashbookTransaction.job_id == job_id,
+        order_by=(LookerCashbookTransaction.uploaded_at.desc(), LookerCashbookTransaction.id.desc())
+    )
     
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    return jsonify(transactions)
 
 @app.route('/api/looker-cashbook-transactions/<int:job_id>', methods=['DELETE'])
 def delete_looker_cashbook_transactions(job_id):
@@ -629,8 +676,10 @@ def upload_stripe_csv(job_id, subsidiary_id):
             ).delete()
             
             # Insert new transactions
+            transactions = []
             transactions_added = 0
             from datetime import datetime  # Move import outside try block
+            uploaded_at = datetime.utcnow()  # One upload timestamp for every row
             
             for _, row in df.iterrows():
                 # Convert created date to dd/mm/yyyy format
@@ -682,7 +731,7 @@ def upload_stripe_csv(job_id, subsidiary_id):
                     if match:
                         description_client_id = match.group(1)
                 
-                transaction = StripeTransaction(
+                transactions.append(dict(
                     subsidiary_id=subsidiary_id,
                     job_id=job_id,
                     client_number=str(row.get('client_number', '')),
@@ -704,11 +753,11 @@ def upload_stripe_csv(job_id, subsidiary_id):
                     purpose_metadata=str(row.get('purpose (metadata)', '')),
                     phorest_client_id_metadata=str(row.get('phorest_client_id (metadata)', '')),
                     filename=file.filename,
-                    uploaded_at=datetime.utcnow()
-                )
-                db.session.add(transaction)
+                    uploaded_at=uploaded_at
+                ))
                 transactions_added += 1
             
+            bulk_insert(db, StripeTransaction, transactions)
             db.session.commit()
             
             return jsonify({
@@ -726,12 +775,14 @@ def upload_stripe_csv(job_id, subsidiary_id):
 @app.route('/api/stripe-transactions/<int:job_id>/<int:subsidiary_id>')
 def get_stripe_transactions(job_id, subsidiary_id):
     """Get Stripe transactions for a specific subsidiary and job"""
-    transactions = StripeTransaction.query.filter_by(
-        subsidiary_id=subsidiary_id,
-        job_id=job_id
-    ).order_by(StripeTransaction.uploaded_at.desc()).all()
+    transactions = select_dicts(
+        db, StripeTransaction,
+        StripeTransaction.subsidiary_id == subsidiary_id,
+        StripeTransaction.job_id == job_id,
+        order_by=(StripeTransaction.uploaded_at.desc(), StripeTransaction.id.desc())
+    )
     
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    return jsonify(transactions)
 
 @app.route('/stripe-data/<int:job_id>/<int:subsidiary_id>')
 def stripe_data_page(job_id, subsidiary_id):
@@ -791,8 +842,10 @@ def upload_cashbook_excel(job_id, subsidiary_id):
             ).delete()
             
             # Insert new transactions
+            transactions = []
             transactions_added = 0
             from datetime import datetime  # Move import outside try block
+            uploaded_at = datetime.utcnow()  # One upload timestamp for every row
             
             for _, row in df.iterrows():
                 # Convert payment date to dd/mm/yyyy format
@@ -817,7 +870,7 @@ def upload_cashbook_excel(job_id, subsidiary_id):
                         except:
                             payment_date_str = str(row.get('payment_date'))
                 
-                transaction = CashbookTransaction(
+                transactions.append(dict(
                     subsidiary_id=subsidiary_id,
                     job_id=job_id,
                     payment_date=payment_date_str,
@@ -839,11 +892,11 @@ def upload_cashbook_excel(job_id, subsidiary_id):
                     payment_hash=str(row.get('payment #', '')),
                     memo=float(row.get('Memo', 0)) if pd.notna(row.get('Memo')) else None,
                     filename=file.filename,
-                    uploaded_at=datetime.utcnow()
-                )
-                db.session.add(transaction)
+                    uploaded_at=uploaded_at
+                ))
                 transactions_added += 1
             
+            bulk_insert(db, CashbookTransaction, transactions)
             db.session.commit()
             
             return jsonify({
@@ -862,12 +915,14 @@ def upload_cashbook_excel(job_id, subsidiary_id):
 @app.route('/api/cashbook-transactions/<int:job_id>/<int:subsidiary_id>')
 def get_cashbook_transactions(job_id, subsidiary_id):
     """Get Cashbook transactions for a specific subsidiary and job"""
-    transactions = CashbookTransaction.query.filter_by(
-        subsidiary_id=subsidiary_id,
-        job_id=job_id
-    ).order_by(CashbookTransaction.uploaded_at.desc()).all()
+    transactions = select_dicts(
+        db, CashbookTransaction,
+        CashbookTransaction.subsidiary_id == subsidiary_id,
+        CashbookTransaction.job_id == job_id,
+        order_by=(CashbookTransaction.uploaded_at.desc(), CashbookTransaction.id.desc())
+    )
     
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    return jsonify(transactions)
 
 @app.route('/cashbook-data/<int:job_id>/<int:subsidiary_id>')
 def cashbook_data_page(job_id, subsidiary_id):
@@ -933,14 +988,16 @@ def reconciliation_results_page(job_id, subsidiary_id, process_name):
 def get_matched_transactions_full(job_id, subsidiary_id):
     """Get all matched transactions with FULL data from both files"""
     try:
-        matches = MatchedTransaction.query.filter_by(
-            job_id=job_id,
-            subsidiary_id=subsidiary_id
-        ).all()
+        matches = select_dicts(
+            db, MatchedTransaction,
+            MatchedTransaction.job_id == job_id,
+            MatchedTransaction.subsidiary_id == subsidiary_id,
+            order_by=(MatchedTransaction.id,)
+        )
         
         return jsonify({
             'count': len(matches),
-            'transactions': [match.to_dict() for match in matches]
+            'transactions': matches
         })
     except Exception as e:
         return jsonify({'error': f'Error fetching matched transactions: {str(e)}'}), 500
@@ -1043,6 +1100,16 @@ def process3_match(job_id, subsidiary_id):
     except Exception as e:
         return jsonify({'error': f'Error in Process 3 analysis: {str(e)}'}), 500
 
+def get_matched_ids(job_id, subsidiary_id):
+    """Return (stripe_ids, cashbook_ids) already matched for a job/subsidiary (two-column Core query, no ORM objects)"""
+    rows = db.session.execute(
+        select(MatchedTransaction.stripe_id, MatchedTransaction.cashbook_id).where(
+            MatchedTransaction.job_id == job_id,
+            MatchedTransaction.subsidiary_id == subsidiary_id
+        )
+    ).all()
+    return {row.stripe_id for row in rows}, {row.cashbook_id for row in rows}
+
 def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job_id, subsidiary_id):
     """
     EU-SPECIFIC Process 2: Advanced matching with ±5 day tolerance
@@ -1051,21 +1118,12 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
     from datetime import datetime, timedelta
     
     matches = []
+    matched_rows = []
     unmatched_stripe_p2 = []
     unmatched_cashbook_p2 = []
     
     # Get already matched transaction IDs from Process 1
-    matched_stripe_ids = set()
-    matched_cashbook_ids = set()
-    
-    existing_matches = MatchedTransaction.query.filter_by(
-        job_id=job_id,
-        subsidiary_id=subsidiary_id
-    ).all()
-    
-    for match in existing_matches:
-        matched_stripe_ids.add(match.stripe_id)
-        matched_cashbook_ids.add(match.cashbook_id)
+    matched_stripe_ids, matched_cashbook_ids = get_matched_ids(job_id, subsidiary_id)
     
     # Filter out already matched transactions
     unmatched_stripe_tx = [tx for tx in stripe_transactions if tx.id not in matched_stripe_ids]
@@ -1083,7 +1141,7 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
         if isinstance(cashbook_tx.payment_date, str):
             try:
                 # Correct format: dd/mm/yyyy (NOT mm/dd/yyyy!)
-                cb_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y').date()
+                cb_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y').date()
             except:
                 print(f"[EU WARNING] Failed to parse Cashbook date: {cashbook_tx.payment_date}")
                 continue
@@ -1111,7 +1169,7 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
         # Parse date
         if isinstance(cashbook_tx.payment_date, str):
             try:
-                cb_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y').date()
+                cb_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y').date()
             except:
                 continue
         else:
@@ -1143,10 +1201,10 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
         # Parse Stripe date
         if isinstance(stripe_tx.created, str):
             try:
-                stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y %H:%M').date()
+                stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y %H:%M').date()
             except:
                 try:
-                    stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y').date()
+                    stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y').date()
                 except Exception as e:
                     print(f"[EU WARNING] Failed to parse Stripe date '{stripe_tx.created}': {e}")
                     continue
@@ -1203,11 +1261,10 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
                 
                 # Create match
                 match_type = f'desc_client_amount_±{date_diff}d'
-                matched_transaction = create_matched_transaction(
+                matched_rows.append(matched_transaction_row(
                     stripe_tx, cashbook_tx, job_id, subsidiary_id, 
                     match_type, 2
-                )
-                db.session.add(matched_transaction)
+                ))
                 
                 matches.append({
                     'stripe_id': stripe_tx.id,
@@ -1251,11 +1308,10 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
                 
                 # Create match
                 match_type = f'client_amount_±{date_diff}d'
-                matched_transaction = create_matched_transaction(
+                matched_rows.append(matched_transaction_row(
                     stripe_tx, cashbook_tx, job_id, subsidiary_id, 
                     match_type, 2
-                )
-                db.session.add(matched_transaction)
+                ))
                 
                 matches.append({
                     'stripe_id': stripe_tx.id,
@@ -1307,11 +1363,10 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
                         # Create match
                         date_diff = abs(days_offset)
                         match_type = f'date_amount_only_±{date_diff}d'
-                        matched_transaction = create_matched_transaction(
+                        matched_rows.append(matched_transaction_row(
                             stripe_tx, cashbook_tx, job_id, subsidiary_id, 
                             match_type, 2
-                        )
-                        db.session.add(matched_transaction)
+                        ))
                         
                         matches.append({
                             'stripe_id': stripe_tx.id,
@@ -1361,6 +1416,7 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
             })
     
     # Commit matches
+    bulk_insert(db, MatchedTransaction, matched_rows)
     db.session.commit()
     
     # Get ALL matched transactions (Process 1 + Process 2)
@@ -1428,21 +1484,12 @@ def perform_process2_matching_eu(stripe_transactions, cashbook_transactions, job
 def perform_process2_matching(stripe_transactions, cashbook_transactions, job_id, subsidiary_id):
     """Process 2: Try multiple matching strategies to match ALL Stripe transactions"""
     matches = []
+    matched_rows = []
     unmatched_stripe_p2 = []
     unmatched_cashbook_p2 = []
     
     # Get already matched transaction IDs from ALL processes
-    matched_stripe_ids = set()
-    matched_cashbook_ids = set()
-    
-    existing_matches = MatchedTransaction.query.filter_by(
-        job_id=job_id,
-        subsidiary_id=subsidiary_id
-    ).all()
-    
-    for match in existing_matches:
-        matched_stripe_ids.add(match.stripe_id)
-        matched_cashbook_ids.add(match.cashbook_id)
+    matched_stripe_ids, matched_cashbook_ids = get_matched_ids(job_id, subsidiary_id)
     
     # Filter out already matched transactions
     unmatched_stripe_tx = [tx for tx in stripe_transactions if tx.id not in matched_stripe_ids]
@@ -1509,10 +1556,9 @@ def perform_process2_matching(stripe_transactions, cashbook_transactions, job_id
             print(f"[DEBUG] MATCH ({match_strategy})! Stripe {stripe_tx.id} <-> Cashbook {matched_cashbook_tx.id}")
             
             # Save match to database with ALL columns from BOTH files
-            matched_transaction = create_matched_transaction(
+            matched_rows.append(matched_transaction_row(
                 stripe_tx, matched_cashbook_tx, job_id, subsidiary_id, match_strategy, 2
-            )
-            db.session.add(matched_transaction)
+            ))
             
             matches.append({
                 'stripe_id': stripe_tx.id,
@@ -1546,6 +1592,7 @@ def perform_process2_matching(stripe_transactions, cashbook_transactions, job_id
         })
     
     # Commit all changes to database
+    bulk_insert(db, MatchedTransaction, matched_rows)
     db.session.commit()
     
     # Get ALL matched transactions (Process 1 + Process 2) to show cumulative results
@@ -1618,16 +1665,7 @@ def perform_process3_analysis(stripe_transactions, job_id, subsidiary_id):
     unmatched_cashbook = []
     
     # Get already matched transaction IDs to exclude them
-    matched_stripe_ids = set()
-    matched_cashbook_ids = set()
-    existing_matches = MatchedTransaction.query.filter_by(
-        job_id=job_id,
-        subsidiary_id=subsidiary_id
-    ).all()
-    
-    for match in existing_matches:
-        matched_stripe_ids.add(match.stripe_id)
-        matched_cashbook_ids.add(match.cashbook_id)
+    matched_stripe_ids, matched_cashbook_ids = get_matched_ids(job_id, subsidiary_id)
     
     # Filter out already matched transactions
     unmatched_stripe_tx = [tx for tx in stripe_transactions if tx.id not in matched_stripe_ids]
@@ -1710,8 +1748,8 @@ def perform_process3_analysis(stripe_transactions, job_id, subsidiary_id):
                     if is_near_match(stripe_tx, cb_tx, date_tolerance_days=2):
                         from datetime import datetime
                         try:
-                            stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y')
-                            cashbook_date = datetime.strptime(cb_tx.payment_date, '%d/%m/%Y')
+                            stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y')
+                            cashbook_date = parse_tx_date(cb_tx.payment_date, '%d/%m/%Y')
                             date_diff = abs((stripe_date - cashbook_date).days)
                         except:
                             date_diff = 'Unknown'
@@ -1828,8 +1866,8 @@ def is_date_amount_match(stripe_tx, cashbook_tx, date_tolerance_days=2):
     
     try:
         # Parse dates
-        stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y') if stripe_tx.created else None
-        cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y') if cashbook_tx.payment_date else None
+        stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y') if stripe_tx.created else None
+        cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y') if cashbook_tx.payment_date else None
         
         if not stripe_date or not cashbook_date:
             return False
@@ -1866,8 +1904,8 @@ def is_near_match(stripe_tx, cashbook_tx, date_tolerance_days=2):
     
     # Check date tolerance
     try:
-        stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y')
-        cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y')
+        stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y')
+        cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y')
         
         date_diff = abs((stripe_date - cashbook_date).days)
         return date_diff <= date_tolerance_days
@@ -1877,7 +1915,13 @@ def is_near_match(stripe_tx, cashbook_tx, date_tolerance_days=2):
 
 def create_matched_transaction(stripe_tx, cashbook_tx, job_id, subsidiary_id, match_type, process_number):
     """Helper function to create a MatchedTransaction with ALL columns from BOTH files"""
-    return MatchedTransaction(
+    return MatchedTransaction(**matched_transaction_row(
+        stripe_tx, cashbook_tx, job_id, subsidiary_id, match_type, process_number
+    ))
+
+def matched_transaction_row(stripe_tx, cashbook_tx, job_id, subsidiary_id, match_type, process_number):
+    """MatchedTransaction column values for a Stripe/Cashbook pair, as a plain dict for bulk_insert"""
+    return dict(
         job_id=job_id,
         subsidiary_id=subsidiary_id,
         # ALL Cashbook columns
@@ -2017,7 +2061,7 @@ def process1_match(job_id, subsidiary_id):
         parsed_dates = []
         for tx in actual_transactions:
             try:
-                date_obj = datetime.strptime(tx.created, '%d/%m/%Y')
+                date_obj = parse_tx_date(tx.created, '%d/%m/%Y')
                 parsed_dates.append((date_obj, tx.created))
             except:
                 continue  # Skip invalid dates
@@ -2086,10 +2130,10 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
                 # Parse date
                 if isinstance(stripe_tx.created, str):
                     try:
-                        stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y %H:%M').date()
+                        stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y %H:%M').date()
                     except:
                         try:
-                            stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y').date()
+                            stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y').date()
                         except:
                             stripe_date = None
                 else:
@@ -2108,7 +2152,7 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
                 # Parse date
                 if isinstance(cashbook_tx.payment_date, str):
                     try:
-                        cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y').date()
+                        cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y').date()
                     except:
                         cashbook_date = None
                 else:
@@ -2172,6 +2216,7 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
         }
     
     matches = []
+    matched_rows = []
     unmatched_stripe = []
     unmatched_cashbook = []
     out_of_cutoff_cashbook = []
@@ -2202,7 +2247,7 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
         if isinstance(cashbook_tx.payment_date, str):
             try:
                 # Correct format: dd/mm/yyyy (NOT mm/dd/yyyy!)
-                cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y').date()
+                cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y').date()
             except Exception as e:
                 print(f"[EU WARNING] Failed to parse Cashbook date '{cashbook_tx.payment_date}': {e}")
                 continue
@@ -2244,11 +2289,11 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
         if isinstance(stripe_tx.created, str):
             try:
                 # Try with time first: dd/mm/yyyy HH:MM
-                stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y %H:%M').date()
+                stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y %H:%M').date()
             except:
                 try:
                     # Try without time: dd/mm/yyyy
-                    stripe_date = datetime.strptime(stripe_tx.created, '%d/%m/%Y').date()
+                    stripe_date = parse_tx_date(stripe_tx.created, '%d/%m/%Y').date()
                 except Exception as e:
                     print(f"[EU WARNING] Failed to parse Stripe date '{stripe_tx.created}': {e}")
                     stripe_date = None
@@ -2291,10 +2336,9 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
                 print(f"[EU DEBUG] Matched {match_count} transactions...")
             
             # Create matched transaction
-            matched_transaction = create_matched_transaction(
+            matched_rows.append(matched_transaction_row(
                 stripe_tx, cashbook_tx, job_id, subsidiary_id, 'perfect_match', 1
-            )
-            db.session.add(matched_transaction)
+            ))
             
             matches.append({
                 'stripe_id': stripe_tx.id,
@@ -2327,10 +2371,10 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
         # Handle date - it might be string or datetime object
         if isinstance(cashbook_tx.payment_date, str):
             try:
-                cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y %H:%M:%S').date()
+                cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y %H:%M:%S').date()
             except:
                 try:
-                    cashbook_date = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y').date()
+                    cashbook_date = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y').date()
                 except:
                     cashbook_date = None
         else:
@@ -2355,6 +2399,7 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
             })
     
     # Commit matches to database
+    bulk_insert(db, MatchedTransaction, matched_rows)
     db.session.commit()
     
     print(f"[EU DEBUG] Process 1 Results: {len(matches)} perfect matches")
@@ -2404,6 +2449,7 @@ def perform_matching_eu(stripe_transactions, cashbook_transactions, cutoff_date,
 def perform_matching(stripe_transactions, cashbook_transactions, cutoff_date, job_id, subsidiary_id):
     """Perform the actual matching logic and save matches to database"""
     perfect_matches = []
+    matched_rows = []
     unmatched_stripe = []
     unmatched_cashbook = []
     out_of_cutoff_cashbook = []
@@ -2446,7 +2492,7 @@ def perform_matching(stripe_transactions, cashbook_transactions, cutoff_date, jo
             is_out_of_cutoff = False
             if cutoff_date_obj and cashbook_tx.payment_date:
                 try:
-                    cashbook_date_obj = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y')
+                    cashbook_date_obj = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y')
                     if cashbook_date_obj > cutoff_date_obj:
                         is_out_of_cutoff = True
                 except:
@@ -2530,10 +2576,9 @@ def perform_matching(stripe_transactions, cashbook_transactions, cutoff_date, jo
         for i, cashbook_tx in enumerate(available_cashbook):
             if is_perfect_match(stripe_tx, cashbook_tx):
                 # Save match to database with ALL columns from BOTH files
-                matched_transaction = create_matched_transaction(
+                matched_rows.append(matched_transaction_row(
                     stripe_tx, cashbook_tx, job_id, subsidiary_id, 'perfect', 1
-                )
-                db.session.add(matched_transaction)
+                ))
                 
                 perfect_matches.append({
                     'stripe_id': stripe_tx.id,
@@ -2563,7 +2608,7 @@ def perform_matching(stripe_transactions, cashbook_transactions, cutoff_date, jo
         is_out_of_cutoff = False
         if cutoff_date_obj and cashbook_tx.payment_date:
             try:
-                cashbook_date_obj = datetime.strptime(cashbook_tx.payment_date, '%d/%m/%Y')
+                cashbook_date_obj = parse_tx_date(cashbook_tx.payment_date, '%d/%m/%Y')
                 if cashbook_date_obj > cutoff_date_obj:
                     is_out_of_cutoff = True
             except:
@@ -2583,6 +2628,7 @@ def perform_matching(stripe_transactions, cashbook_transactions, cutoff_date, jo
             unmatched_cashbook.append(cashbook_info)
     
     # Commit all matches to database
+    bulk_insert(db, MatchedTransaction, matched_rows)
     db.session.commit()
     
     # Save reconciliation results metadata
@@ -3127,7 +3173,7 @@ def download_unmatched_cashbook(job_id, subsidiary_id):
                 is_out_of_cutoff = False
                 if cutoff_date and tx.payment_date:
                     try:
-                        tx_date = datetime.strptime(tx.payment_date, '%d/%m/%Y')
+                        tx_date = parse_tx_date(tx.payment_date, '%d/%m/%Y')
                         if tx_date > cutoff_date:
                             is_out_of_cutoff = True
                     except:
@@ -3991,7 +4037,7 @@ def download_out_of_cutoff(job_id, subsidiary_id):
         for tx in all_cashbook:
             if tx.payment_date:
                 try:
-                    tx_date = datetime.strptime(tx.payment_date, '%d/%m/%Y')
+                    tx_date = parse_tx_date(tx.payment_date, '%d/%m/%Y')
                     if tx_date > cutoff_date:
                         out_of_cutoff.append({
                             'Payment Date': tx.payment_date,
@@ -4089,9 +4135,12 @@ def preview_journals(job_id, subsidiary_id):
         if subsidiary_id == 4:
             from journal_generation.journal_builder_eu import JournalBuilderEU
             builder_class = JournalBuilderEU
+            generate_kwargs = {}
         else:
             from journal_generation.journal_builder import JournalBuilder
             builder_class = JournalBuilder
+            # The preview only returns counts/totals, which JournalBuilder can compute in SQL
+            generate_kwargs = {'summary_only': True}
         
         # Check if journals have already been generated
         existing_journals = JournalTransaction.query.filter_by(
@@ -4110,13 +4159,13 @@ def preview_journals(job_id, subsidiary_id):
         
         if existing_journals:
             # Journals exist - return existing data
-            result = builder.generate_all()
+            result = builder.generate_all(**generate_kwargs)
             result['journals_exist'] = True
             result['message'] = 'Showing existing journals. Use Clear Journals to regenerate.'
             return jsonify(result)
         else:
             # No journals exist - generate new ones
-            result = builder.generate_all()
+            result = builder.generate_all(**generate_kwargs)
             if not result.get('success') and 'No matched transactions' in result.get('error', ''):
                 result['needs_sync'] = True
             result['journals_exist'] = False
@@ -4266,7 +4315,7 @@ def fp_load_combined(job_id, subsidiary_id):
         if exists:
             return jsonify({'success': False, 'error': 'Combined dataset already loaded. Clear data to reload.'}), 409
         # copy rows
-        rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+        rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).all()
         created = 0
         for r in rows:
             wr = FPWorkingRow(
@@ -4342,6 +4391,7 @@ def fp_data(job_id, subsidiary_id):
         q = FPJournalRow.query.filter_by(dataset_id=dataset.id)
         total_count = q.count()
         total_amount = float(sum((r.amount or 0) for r in q))
+        q = q.order_by(FPJournalRow.id)
         for r in (q.limit(limit).all() if limit > 0 else q.all()):
             rows_json.append({
                 'journal_type': r.journal_type,
@@ -4440,7 +4490,7 @@ def fp_summit_process(job_id, subsidiary_id):
             return jsonify({'success': False, 'error': 'No committed dataset found'}), 400
         
         # Check if summit data uploaded
-        summit_installments = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).all()
+        summit_installments = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).order_by(FPSummitInstallment.id).all()
         if not summit_installments:
             return jsonify({'success': False, 'error': 'No summit data uploaded'}), 400
         
@@ -4454,14 +4504,17 @@ def fp_summit_process(job_id, subsidiary_id):
         
         # Store original amounts before any processing (if not already stored)
         if not dataset.original_amounts:
-            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+            # Only the client and amount columns are needed for the per-client totals
+            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).with_entities(
+                FPJournalRow.client_id, FPJournalRow.amount
+            ).order_by(FPJournalRow.id).all()
             original_amounts = {}
-            for row in journal_rows:
-                client_id = str(row.client_id).strip()
+            for client_id, amount in journal_rows:
+                client_id = str(client_id).strip()
                 if client_id:
                     if client_id not in original_amounts:
                         original_amounts[client_id] = 0
-                    original_amounts[client_id] += float(row.amount or 0)
+                    original_amounts[client_id] += float(amount or 0)
             
             dataset.original_amounts = json.dumps(original_amounts)
             db.session.commit()
@@ -4529,7 +4582,7 @@ def fp_summit_process(job_id, subsidiary_id):
             f.write(f"Working lookup has {len(working_lookup)} clients\n\n")
         
         # Get all journal rows for updating
-        journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+        journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).all()
         journal_lookup = {}
         for row in journal_rows:
             client_id = str(row.client_id).strip() if row.client_id else ''
@@ -4717,7 +4770,7 @@ def generate_summit_journal_files(dataset_id, job_id, subsidiary_id, unmatched_s
         journal_type = journal_type_tuple[0]
         
         # Get all rows for this journal type
-        rows = FPJournalRow.query.filter_by(dataset_id=dataset_id, journal_type=journal_type).all()
+        rows = FPJournalRow.query.filter_by(dataset_id=dataset_id, journal_type=journal_type).order_by(FPJournalRow.id).all()
         
         if not rows:
             continue
@@ -4843,7 +4896,7 @@ def fp_summit_details(job_id, subsidiary_id):
             db_client_amounts = json.loads(dataset.original_amounts)
         else:
             # Fallback to current journal amounts if original not stored
-            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).all()
             db_client_amounts = {}
             for row in journal_rows:
                 client_id = str(row.client_id).strip()
@@ -4975,7 +5028,7 @@ def fp_summit_clear(job_id, subsidiary_id):
         if original_amounts:
             
             # Restore journal rows
-            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+            journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).all()
             for row in journal_rows:
                 client_id = str(row.client_id).strip()
                 if client_id in original_amounts:
@@ -5179,6 +5232,14 @@ def download_split_journal(job_id, subsidiary_id, journal_type):
         if journal_df is None or journal_df.empty:
             return jsonify({'error': f'Journal type "{journal_type}" not found or empty'}), 404
         
+        download_name = f'{journal_type}_{builder.subsidiary_name}_Job{job_id}.csv'
+        
+        # Stream the CSV in row chunks when the builder supports it
+        if hasattr(builder, 'export_journal_iter'):
+            response = Response(builder.export_journal_iter(journal_df, journal_type), mimetype='text/csv')
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+            return response
+        
         # Export to CSV
         csv_file = builder.export_journal_to_csv(journal_df, journal_type)
         
@@ -5186,7 +5247,7 @@ def download_split_journal(job_id, subsidiary_id, journal_type):
             csv_file,
             mimetype='text/csv',
             as_attachment=True,
-            download_name=f'{journal_type}_{builder.subsidiary_name}_Job{job_id}.csv'
+            download_name=download_name
         )
         
     except Exception as e:
@@ -5250,30 +5311,21 @@ def process_installments(job_id, subsidiary_id):
         if not matches:
             return jsonify({'success': False, 'error': 'No matched transactions found'}), 404
         
+        # Clean and convert amounts for the whole file at once
+        # (handle commas, spaces, and parentheses for negative numbers, e.g. "(93.28)" -> -93.28)
+        from journal_generation.journal_builder import JournalBuilder
+        df['installment_amount'] = JournalBuilder._clean_amount_series(df['installment_amount'])
+        if 'total_amount' in df.columns:
+            df['total_amount'] = JournalBuilder._clean_amount_series(df['total_amount'])
+        else:
+            df['total_amount'] = df['installment_amount']  # Use total_amount if available
+        
         # Process installments
         processed_count = 0
         split_count = 0
         installment_records = []
         
-        for _, installment_row in df.iterrows():
-            client_id = installment_row['client_id']
-            
-            # Clean and convert amounts (handle commas, spaces, and parentheses for negative numbers)
-            def clean_amount(amount_str):
-                if pd.isna(amount_str):
-                    return 0.0
-                
-                # Convert to string and clean
-                cleaned = str(amount_str).replace(',', '').strip()
-                
-                # Handle parentheses for negative numbers (e.g., "(93.28)" -> -93.28)
-                if cleaned.startswith('(') and cleaned.endswith(')'):
-                    cleaned = '-' + cleaned[1:-1]
-                
-                return float(cleaned) if cleaned else 0.0
-            
-            installment_amount = clean_amount(installment_row['installment_amount'])
-            total_amount = clean_amount(installment_row.get('total_amount', installment_amount))  # Use total_amount if available
+        for client_id, installment_amount, total_amount in zip(df['client_id'], df['installment_amount'], df['total_amount']):
             
             # Find matching transactions
             for match in matches:
@@ -5363,6 +5415,26 @@ def process_installments(job_id, subsidiary_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': f'Error processing installments: {str(e)}'}), 500
 
+def get_journals_cache_filename(job_id, subsidiary_id, memo):
+    """Build the cache file name for a journals ZIP from the current matched data and memo"""
+    count, max_id = db.session.query(
+        db.func.count(MatchedTransaction.id),
+        db.func.max(MatchedTransaction.id)
+    ).filter_by(job_id=job_id, subsidiary_id=subsidiary_id).one()
+    memo_hash = hashlib.md5((memo or '').encode('utf-8')).hexdigest()[:12]
+    return f'{job_id}_{subsidiary_id}_{count}_{max_id or 0}_{memo_hash}.zip'
+
+def evict_journals_cache():
+    """Remove cached journal ZIP files older than JOURNALS_CACHE_MAX_AGE seconds"""
+    cutoff = time.time() - app.config['JOURNALS_CACHE_MAX_AGE']
+    for entry in os.scandir(JOURNALS_CACHE_FOLDER):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            # File already removed by another worker
+            pass
+
 @app.route('/api/journals/download-all/<int:job_id>/<int:subsidiary_id>', methods=['POST'])
 def download_all_journals_new(job_id, subsidiary_id):
     """Download all journals as a ZIP file"""
@@ -5390,6 +5462,20 @@ def download_all_journals_new(job_id, subsidiary_id):
             'JournalTransaction': JournalTransaction
         }
         builder = builder_class(db, job_id, subsidiary_id, models)
+        download_name = f'All_Journals_{builder.subsidiary_name}_Job{job_id}.zip'
+        
+        # Serve a previously generated ZIP from disk if the matched data and memo are unchanged
+        evict_journals_cache()
+        cache_filename = get_journals_cache_filename(job_id, subsidiary_id, memo)
+        if os.path.exists(os.path.join(JOURNALS_CACHE_FOLDER, cache_filename)):
+            return send_from_directory(
+                JOURNALS_CACHE_FOLDER,
+                cache_filename,
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=download_name
+            )
+        
         all_journals = builder.export_all_journals(memo)
         
         if not all_journals:
@@ -5404,13 +5490,19 @@ def download_all_journals_new(job_id, subsidiary_id):
                     csv_file.getvalue()
                 )
         
-        zip_buffer.seek(0)
+        # Persist the ZIP for repeat downloads (write to a temp file first so readers never see a partial file)
+        cache_path = os.path.join(JOURNALS_CACHE_FOLDER, cache_filename)
+        tmp_path = f'{cache_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(zip_buffer.getvalue())
+        os.replace(tmp_path, cache_path)
         
-        return send_file(
-            zip_buffer,
+        return send_from_directory(
+            JOURNALS_CACHE_FOLDER,
+            cache_filename,
             mimetype='application/zip',
             as_attachment=True,
-            download_name=f'All_Journals_{builder.subsidiary_name}_Job{job_id}.zip'
+            download_name=download_name
         )
         
     except Exception as e:
@@ -5435,7 +5527,8 @@ def download_all_journals(job_id, subsidiary_id):
             'JournalTransaction': JournalTransaction
         }
         builder = JournalBuilder(db, job_id, subsidiary_id, models)
-        result = builder.generate_all()
+        # Only success is checked here; the master journal is built below
+        result = builder.generate_all(summary_only=True)
         
         if not result.get('success'):
             # Return empty file with message
@@ -2,7 +2,9 @@ import os
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
-load_dotenv()
+# Set SKIP_DOTENV=1 where the environment is injected by the deployment (e.g. production containers)
+if not os.environ.get('SKIP_DOTENV'):
+    load_dotenv(verbose=False, override=False)
 
 class Config:
     """Base configuration class"""
@@ -12,10 +14,13 @@ class Config:
     # File upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    ALLOWED_EXTENSIONS = frozenset(('xlsx', 'xls', 'csv'))
     
     # Processing settings
     PROCESSING_TIMEOUT = 300  # 5 minutes timeout for processing jobs
+    
+    # Generated journal ZIP files are cached on disk for repeat downloads
+    JOURNALS_CACHE_MAX_AGE = 30 * 60  # 30 minutes
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -7,10 +7,13 @@ Run this script to create the database and tables
 import os
 import sys
 from sqlalchemy import create_engine, text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from app import app, db
 from models import Receipt, ProcessingJob
 
+# PostgreSQL SQLSTATE for duplicate_database
+DUPLICATE_DATABASE = '42P04'
+
 def create_database():
     """Create the database if it doesn't exist"""
     # Get database URL from config
@@ -23,17 +26,20 @@ def create_database():
         base_url = database_url.rsplit('/', 1)[0]
         
         # Connect to PostgreSQL server (not specific database)
-        engine = create_engine(base_url + '/postgres')
+        # CREATE DATABASE cannot run inside a transaction block
+        engine = create_engine(base_url + '/postgres', isolation_level='AUTOCOMMIT')
         
         try:
             with engine.connect() as conn:
-                # Check if database exists
-                result = conn.execute(text(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'"))
-                if not result.fetchone():
-                    # Create database
-                    conn.execute(text(f"CREATE DATABASE {db_name}"))
+                # Create database in a single round-trip; an existing database raises duplicate_database
+                quoted_name = engine.dialect.identifier_preparer.quote(db_name)
+                try:
+                    conn.execute(text(f"CREATE DATABASE {quoted_name}"))
                     print(f"Database '{db_name}' created successfully")
-                else:
+                except ProgrammingError as e:
+                    sqlstate = getattr(e.orig, 'sqlstate', None) or getattr(e.orig, 'pgcode', None)
+                    if sqlstate != DUPLICATE_DATABASE:
+                        raise
                     print(f"Database '{db_name}' already exists")
         except OperationalError as e:
             print(f"Error connecting to PostgreSQL: {e}")
@@ -10,9 +10,39 @@ HARD RULE: This class is COMPLETELY READ-ONLY
 """
 
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import io
+from sqlalchemy import select, exists, func, case
+
+
+# Subsidiary mapping
+SUBSIDIARY_NAMES = {
+    1: "Australia",
+    2: "Canada",
+    3: "USA",
+    4: "EU",
+    5: "UK"
+}
+
+# Hardcoded bank accounts for each subsidiary
+BANK_ACCOUNTS = {
+    1: "10130 Bank : CB current a/c AU$ # 411110236694",  # Australia
+    2: "10150 Bank : CIBC Current Account 9066314",  # Canada
+    3: "10043 Bank : CIBC operating a/c US$ # 2605090",  # USA
+    4: "10010 Bank : BOI current a/c EUR # 17013705",  # EU (Ireland)
+    5: "10020 Bank : BOI current a/c GBP # 62100285"  # UK
+}
+
+# Billing entities for each subsidiary
+BILLING_ENTITIES = {
+    1: "Ndevor Systems Ltd : Phorest Australia",
+    2: "Ndevor Systems Ltd : Phorest Canada",
+    3: "Ndevor Systems Ltd : Phorest US",
+    4: "Ndevor Systems Ltd : Phorest Ireland",
+    5: "Ndevor Systems Ltd : Phorest Ireland : Phorest UK"
+}
 
 
 class JournalBuilder:
@@ -20,6 +50,81 @@ class JournalBuilder:
     Main class for building journals from reconciliation data
     """
     
+    # Columns coerced to numbers before export
+    NUMERIC_COLUMNS = ('amount', 'exchange_rate', 'stripe_amount', 'stripe_converted_amount', 'Dr', 'Cr')
+    
+    # Money columns rounded to 2 decimals before export
+    MONEY_COLUMNS = ('amount', 'stripe_amount', 'stripe_converted_amount', 'Dr', 'Cr')
+    
+    # (DataFrame column, MatchedTransaction column) pairs for the matched transactions frame
+    MATCHED_FIELDS = (
+        ('payment_date', 'cb_payment_date'),
+        ('client_id', 'cb_client_id'),
+        ('invoice_number', 'cb_invoice_number'),
+        ('billing_entity', 'cb_billing_entity'),
+        ('ar_account', 'cb_ar_account'),
+        ('currency', 'cb_currency'),
+        ('exchange_rate', 'cb_exchange_rate'),
+        ('amount', 'stripe_amount'),  # Use Stripe amount (same as reconciliation)
+        ('account', 'cb_account'),
+        ('location', 'cb_location'),
+        ('transtype', 'cb_transtype'),
+        ('comment', 'cb_comment'),
+        ('card_reference', 'cb_card_reference'),
+        ('reasoncode', 'cb_reasoncode'),
+        ('sepaprovider', 'cb_sepaprovider'),
+        ('invoice_hash', 'cb_invoice_hash'),
+        ('payment_hash', 'cb_payment_hash'),
+        ('memo', 'cb_memo'),
+        # Include Stripe data for reference
+        ('stripe_amount', 'stripe_amount'),
+        ('stripe_currency', 'stripe_currency'),
+        ('stripe_converted_amount', 'stripe_converted_amount'),
+        ('stripe_type', 'stripe_type'),
+        ('stripe_created', 'stripe_created'),
+        ('match_type', 'match_type')
+    )
+    
+    # Columns returned for unmatched Stripe/Cashbook transactions
+    UNMATCHED_STRIPE_FIELDS = ('id', 'client_number', 'type', 'created', 'description', 'amount', 'currency', 'net')
+    UNMATCHED_CASHBOOK_FIELDS = ('id', 'payment_date', 'client_id', 'amount', 'billing_entity', 'transtype')
+    
+    # Low-cardinality matched transaction columns stored as categoricals
+    CATEGORY_COLUMNS = (
+        'billing_entity', 'ar_account', 'currency', 'account', 'location',
+        'transtype', 'sepaprovider', 'match_type'
+    )
+    
+    # JournalTransaction fields copied unchanged from the original journal onto a Salon Summit installment
+    INSTALLMENT_COPY_FIELDS = (
+        'job_id', 'subsidiary_id', 'matched_transaction_id',
+        'cb_payment_date', 'cb_client_id', 'cb_invoice_number', 'cb_billing_entity', 'cb_ar_account',
+        'cb_currency', 'cb_exchange_rate', 'cb_account', 'cb_location', 'cb_transtype', 'cb_comment',
+        'cb_card_reference', 'cb_reasoncode', 'cb_sepaprovider', 'cb_memo',
+        'stripe_client_number', 'stripe_type', 'stripe_stripe_id', 'stripe_created', 'stripe_description',
+        'stripe_currency', 'stripe_converted_amount', 'stripe_fees', 'stripe_net', 'stripe_converted_currency',
+        'stripe_details', 'stripe_customer_id', 'stripe_customer_email', 'stripe_customer_name',
+        'stripe_purpose_metadata', 'stripe_phorest_client_id_metadata'
+    )
+    
+    # Rows per chunk when streaming query results into pandas
+    READ_CHUNK_SIZE = 50000
+    
+    # StripeTransaction columns for the all-Stripe frame
+    STRIPE_FIELDS = (
+        'id', 'client_number', 'type', 'stripe_id', 'created', 'description', 'amount',
+        'currency', 'converted_amount', 'fees', 'net', 'converted_currency', 'details',
+        'customer_id', 'customer_email', 'customer_name', 'purpose_metadata',
+        'phorest_client_id_metadata', 'description_client_id'
+    )
+    
+    # CashbookTransaction columns for the all-Cashbook frame
+    CASHBOOK_FIELDS = (
+        'id', 'payment_date', 'client_id', 'invoice_number', 'billing_entity', 'ar_account',
+        'currency', 'exchange_rate', 'amount', 'account', 'location', 'transtype', 'comment',
+        'card_reference', 'reasoncode', 'sepaprovider', 'invoice_hash', 'payment_hash', 'memo'
+    )
+    
     def __init__(self, db, job_id: int, subsidiary_id: int, models=None):
         """
         Initialize the journal builder
@@ -35,261 +140,164 @@ class JournalBuilder:
         self.subsidiary_id = subsidiary_id
         self.models = models or {}
         
+        # Resolve model classes and their Core tables once (fail fast if a required model is missing)
+        self.MatchedTransaction = self._resolve_model('MatchedTransaction')
+        self.StripeTransaction = self._resolve_model('StripeTransaction')
+        self.CashbookTransaction = self._resolve_model('CashbookTransaction')
+        self.JournalTransaction = self._resolve_model('JournalTransaction', required=False)
+        self._matched_table = self.MatchedTransaction.__table__
+        self._stripe_table = self.StripeTransaction.__table__
+        self._cashbook_table = self.CashbookTransaction.__table__
+        
         # Subsidiary mapping
-        self.subsidiary_names = {
-            1: "Australia",
-            2: "Canada",
-            3: "USA",
-            4: "EU",
-            5: "UK"
-        }
+        self.subsidiary_names = SUBSIDIARY_NAMES
+        self.bank_accounts = BANK_ACCOUNTS
+        self.billing_entities = BILLING_ENTITIES
         
-        self.subsidiary_name = self.subsidiary_names.get(subsidiary_id, "Unknown")
+        # Per-subsidiary constants resolved once
+        self.subsidiary_name = SUBSIDIARY_NAMES.get(subsidiary_id, "Unknown")
+        self.bank_account = BANK_ACCOUNTS.get(subsidiary_id, '')
+        self.billing_entity = BILLING_ENTITIES.get(subsidiary_id, '')
         
-        # Hardcoded bank accounts for each subsidiary
-        self.bank_accounts = {
-            1: "10130 Bank : CB current a/c AU$ # 411110236694",  # Australia
-            2: "10150 Bank : CIBC Current Account 9066314",  # Canada
-            3: "10043 Bank : CIBC operating a/c US$ # 2605090",  # USA
-            4: "10010 Bank : BOI current a/c EUR # 17013705",  # EU (Ireland)
-            5: "10020 Bank : BOI current a/c GBP # 62100285"  # UK
-        }
+        # Matched transactions are fetched once per builder and reused by every journal step
+        self._matched_cache: Optional[pd.DataFrame] = None
+        self._matched_order: Optional[np.ndarray] = None
         
-        # Billing entities for each subsidiary
-        self.billing_entities = {
-            1: "Ndevor Systems Ltd : Phorest Australia",
-            2: "Ndevor Systems Ltd : Phorest Canada",
-            3: "Ndevor Systems Ltd : Phorest US",
-            4: "Ndevor Systems Ltd : Phorest Ireland",
-            5: "Ndevor Systems Ltd : Phorest Ireland : Phorest UK"
-        }
-        
-    def get_matched_transactions(self) -> pd.DataFrame:
+    def _resolve_model(self, name: str, required: bool = True):
         """
-        Get all matched transactions as a DataFrame
-        Reads directly from MatchedTransaction (same source as reconciliation)
+        Look up a model class from the models passed in, falling back to the SQLAlchemy registry
         
+        Args:
+            name: Model class name
+            required: Raise ValueError if the model cannot be found
+            
         Returns:
-            DataFrame with all matched transaction data
+            Model class (or None if not required and not found)
         """
-        # Use MatchedTransaction directly (same as reconciliation & master upload)
-        if 'MatchedTransaction' in self.models:
-            MatchedTransaction = self.models['MatchedTransaction']
-        else:
-            # Fallback: try to get from db metadata
-            MatchedTransaction = self.db.Model.registry._class_registry.data.get('MatchedTransaction')
-        if not MatchedTransaction:
-            raise ValueError("MatchedTransaction model not available")
+        model = self.models.get(name) or self.db.Model.registry._class_registry.get(name)
+        if not model and required:
+            raise ValueError(f"{name} model not available")
+        return model
+    
+    def _read_frame(self, stmt) -> pd.DataFrame:
+        """
+        Stream a Core select into a DataFrame chunk by chunk (server-side cursor),
+        skipping the intermediate list of Python rows
         
-        # Get matched transactions directly from source
-        matches = MatchedTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
+        Args:
+            stmt: SQLAlchemy select with labelled columns
+            
+        Returns:
+            DataFrame with the query results (empty DataFrame if no rows)
+        """
+        chunks = pd.read_sql_query(
+            stmt.execution_options(stream_results=True),
+            self.db.session.connection(),
+            chunksize=self.READ_CHUNK_SIZE
+        )
+        df = pd.concat(chunks, ignore_index=True, copy=False)
         
-        if not matches:
+        if df.empty:
             return pd.DataFrame()
         
-        # Convert to list of dicts with all cashbook columns
-        data = []
-        for match in matches:
-            row = {
-                'payment_date': match.cb_payment_date,
-                'client_id': match.cb_client_id,
-                'invoice_number': match.cb_invoice_number,
-                'billing_entity': match.cb_billing_entity,
-                'ar_account': match.cb_ar_account,
-                'currency': match.cb_currency,
-                'exchange_rate': match.cb_exchange_rate,
-                'amount': match.stripe_amount,  # Use Stripe amount (same as reconciliation)
-                'account': match.cb_account,
-                'location': match.cb_location,
-                'transtype': match.cb_transtype,
-                'comment': match.cb_comment,
-                'card_reference': match.cb_card_reference,
-                'reasoncode': match.cb_reasoncode,
-                'sepaprovider': match.cb_sepaprovider,
-                'invoice_hash': match.cb_invoice_hash,
-                'payment_hash': match.cb_payment_hash,
-                'memo': match.cb_memo,
-                # Include Stripe data for reference
-                'stripe_amount': match.stripe_amount,
-                'stripe_currency': match.stripe_currency,
-                'stripe_converted_amount': match.stripe_converted_amount,
-                'stripe_type': match.stripe_type,
-                'stripe_created': match.stripe_created,
-                'match_type': match.match_type if hasattr(match, 'match_type') else None
-            }
-            data.append(row)
+        return df
+    
+    def get_matched_transactions(self) -> pd.DataFrame:
+        """
+        Get all matched transactions as a DataFrame
+        Reads directly from MatchedTransaction (same source as reconciliation)
+        
+        Results are cached on the builder; call refresh() to re-read the database.
+        The returned DataFrame is shared - callers must not modify it in place.
         
-        df = pd.DataFrame(data)
+        Returns:
+            DataFrame with all matched transaction data
+        """
+        if self._matched_cache is not None:
+            return self._matched_cache
+        
+        # Get matched transactions directly from source (Core select - no ORM object hydration)
+        # Uses MatchedTransaction directly (same as reconciliation & master upload)
+        table = self._matched_table
+        stmt = select(*[table.c[source].label(name) for name, source in self.MATCHED_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id
+        ).order_by(table.c.id)  # Insertion order, whichever job/subsidiary index the planner picks
+        df = self._read_frame(stmt)
+        
+        if not df.empty:
+            # A handful of distinct values per column - int codes instead of one Python string per row
+            df = df.astype({col: 'category' for col in self.CATEGORY_COLUMNS}, copy=False)
         
         # No longer adjust for installments - use raw amounts from MatchedTransaction
         # (Installment processing now handled separately in journals_bp.py)
         
+        self._matched_cache = df
         return df
     
+    def refresh(self):
+        """Drop cached matched transactions so the next call re-reads the database"""
+        self._matched_cache = None
+        self._matched_order = None
+    
+    def _get_sorted_positions(self) -> np.ndarray:
+        """Row positions of the matched transactions ordered by payment_date (cached with the matched data)"""
+        if self._matched_order is None:
+            df = self.get_matched_transactions()
+            self._matched_order = df['payment_date'].reset_index(drop=True).sort_values().index.to_numpy()
+        return self._matched_order
+    
     def get_all_stripe_transactions(self) -> pd.DataFrame:
         """Get ALL Stripe transactions (matched + unmatched)"""
-        StripeTransaction = self.models.get('StripeTransaction')
-        if not StripeTransaction:
-            raise ValueError("StripeTransaction model not available")
-        
-        transactions = StripeTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
-        
-        if not transactions:
-            return pd.DataFrame()
-        
-        data = []
-        for tx in transactions:
-            row = {
-                'id': tx.id,
-                'client_number': tx.client_number,
-                'type': tx.type,
-                'stripe_id': tx.stripe_id,
-                'created': tx.created,
-                'description': tx.description,
-                'amount': tx.amount,
-                'currency': tx.currency,
-                'converted_amount': tx.converted_amount,
-                'fees': tx.fees,
-                'net': tx.net,
-                'converted_currency': tx.converted_currency,
-                'details': tx.details,
-                'customer_id': tx.customer_id,
-                'customer_email': tx.customer_email,
-                'customer_name': tx.customer_name,
-                'purpose_metadata': tx.purpose_metadata,
-                'phorest_client_id_metadata': tx.phorest_client_id_metadata,
-                'description_client_id': tx.description_client_id
-            }
-            data.append(row)
-        
-        return pd.DataFrame(data)
+        table = self._stripe_table
+        stmt = select(*[table.c[name] for name in self.STRIPE_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id
+        )
+        return self._read_frame(stmt)
     
     def get_all_cashbook_transactions(self) -> pd.DataFrame:
         """Get ALL Cashbook transactions (matched + unmatched)"""
-        CashbookTransaction = self.models.get('CashbookTransaction')
-        if not CashbookTransaction:
-            raise ValueError("CashbookTransaction model not available")
-        
-        transactions = CashbookTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
-        
-        if not transactions:
-            return pd.DataFrame()
-        
-        data = []
-        for tx in transactions:
-            row = {
-                'id': tx.id,
-                'payment_date': tx.payment_date,
-                'client_id': tx.client_id,
-                'invoice_number': tx.invoice_number,
-                'billing_entity': tx.billing_entity,
-                'ar_account': tx.ar_account,
-                'currency': tx.currency,
-                'exchange_rate': tx.exchange_rate,
-                'amount': tx.amount,
-                'account': tx.account,
-                'location': tx.location,
-                'transtype': tx.transtype,
-                'comment': tx.comment,
-                'card_reference': tx.card_reference,
-                'reasoncode': tx.reasoncode,
-                'sepaprovider': tx.sepaprovider,
-                'invoice_hash': tx.invoice_hash,
-                'payment_hash': tx.payment_hash,
-                'memo': tx.memo
-            }
-            data.append(row)
-        
-        return pd.DataFrame(data)
+        table = self._cashbook_table
+        stmt = select(*[table.c[name] for name in self.CASHBOOK_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id
+        )
+        return self._read_frame(stmt)
     
     def get_unmatched_stripe(self) -> pd.DataFrame:
         """Get unmatched Stripe transactions"""
-        StripeTransaction = self.models.get('StripeTransaction')
-        MatchedTransaction = self.models.get('MatchedTransaction')
-        if not StripeTransaction or not MatchedTransaction:
-            raise ValueError("Required models not available")
-        
-        # Get all matched Stripe IDs
-        matched_ids = set()
-        matches = MatchedTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
-        for match in matches:
-            matched_ids.add(match.stripe_id)
-        
-        # Get unmatched Stripe transactions
-        transactions = StripeTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).filter(~StripeTransaction.id.in_(matched_ids)).all()
-        
-        if not transactions:
-            return pd.DataFrame()
-        
-        data = []
-        for tx in transactions:
-            row = {
-                'id': tx.id,
-                'client_number': tx.client_number,
-                'type': tx.type,
-                'created': tx.created,
-                'description': tx.description,
-                'amount': tx.amount,
-                'currency': tx.currency,
-                'net': tx.net
-            }
-            data.append(row)
-        
-        return pd.DataFrame(data)
+        # Get unmatched Stripe transactions (NOT EXISTS anti-join - matched IDs never leave the database)
+        table = self._stripe_table
+        matched = self._matched_table
+        is_matched = exists().where(
+            matched.c.stripe_id == table.c.id,
+            matched.c.job_id == self.job_id,
+            matched.c.subsidiary_id == self.subsidiary_id
+        )
+        stmt = select(*[table.c[name] for name in self.UNMATCHED_STRIPE_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id,
+            ~is_matched
+        )
+        return self._read_frame(stmt)
     
     def get_unmatched_cashbook(self) -> pd.DataFrame:
         """Get unmatched Cashbook transactions"""
-        CashbookTransaction = self.models.get('CashbookTransaction')
-        MatchedTransaction = self.models.get('MatchedTransaction')
-        if not CashbookTransaction or not MatchedTransaction:
-            raise ValueError("Required models not available")
-        
-        # Get all matched Cashbook IDs
-        matched_ids = set()
-        matches = MatchedTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
-        for match in matches:
-            matched_ids.add(match.cashbook_id)
-        
-        # Get unmatched Cashbook transactions
-        transactions = CashbookTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).filter(~CashbookTransaction.id.in_(matched_ids)).all()
-        
-        if not transactions:
-            return pd.DataFrame()
-        
-        data = []
-        for tx in transactions:
-            row = {
-                'id': tx.id,
-                'payment_date': tx.payment_date,
-                'client_id': tx.client_id,
-                'amount': tx.amount,
-                'billing_entity': tx.billing_entity,
-                'transtype': tx.transtype
-            }
-            data.append(row)
-        
-        return pd.DataFrame(data)
+        # Get unmatched Cashbook transactions (NOT EXISTS anti-join - matched IDs never leave the database)
+        table = self._cashbook_table
+        matched = self._matched_table
+        is_matched = exists().where(
+            matched.c.cashbook_id == table.c.id,
+            matched.c.job_id == self.job_id,
+            matched.c.subsidiary_id == self.subsidiary_id
+        )
+        stmt = select(*[table.c[name] for name in self.UNMATCHED_CASHBOOK_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id,
+            ~is_matched
+        )
+        return self._read_frame(stmt)
     
     def generate_master_journal(self, memo: Optional[str] = None) -> pd.DataFrame:
         """
@@ -307,38 +315,77 @@ class JournalBuilder:
         if df.empty:
             return df
         
-        # Apply memo if provided
-        if memo:
-            df['memo'] = memo
-        else:
-            df['memo'] = ''
+        # Sort by payment_date
+        return self._format_journal_rows(df.iloc[self._get_sorted_positions()], memo)
+    
+    def _format_journal_rows(self, df: pd.DataFrame, memo: Optional[str] = None) -> pd.DataFrame:
+        """
+        Apply memo, bank account, invoice #/payment # and cashbook column names to matched rows
+        
+        Args:
+            df: Matched transaction rows (left unmodified)
+            memo: Optional memo text to populate in the Memo column
+            
+        Returns:
+            New DataFrame in cashbook format
+        """
+        # Apply memo if provided (assign returns a new frame - the cached matched data is left untouched)
+        df = df.assign(memo=memo if memo else '')
         
         # Ensure the correct bank account is used (hardcoded per subsidiary)
-        bank_account = self.bank_accounts.get(self.subsidiary_id, '')
-        if bank_account:
-            df['account'] = bank_account
+        if self.bank_account:
+            df['account'] = self.bank_account
         
         # Add the required formulas for invoice # and payment #
-        journal_df = df.copy()
+        # (df is already our own frame from assign above - no further copy needed)
         
         # Invoice # formula: CPMT: {invoice_number}
-        journal_df['invoice #'] = 'CPMT: ' + journal_df['invoice_number'].astype(str)
+        invoice_ref = 'CPMT: ' + df['invoice_number'].astype(str)
+        df['invoice #'] = invoice_ref
         
         # Payment # formula: CPMT: {invoice_number}-{date}
-        # Convert date to string format (dd/mm/yyyy)
-        journal_df['payment #'] = 'CPMT: ' + journal_df['invoice_number'].astype(str) + '-' + journal_df['payment_date'].astype(str)
+        # Reuses the invoice # column so invoice_number is only converted once (date is dd/mm/yyyy)
+        df['payment #'] = invoice_ref.str.cat(df['payment_date'].astype(str), sep='-')
         
         # Rename other columns to match cashbook upload format
-        journal_df = journal_df.rename(columns={
+        df.rename(columns={
             'location': 'Location',
             'card_reference': 'Card Reference',
             'memo': 'Memo'
-        })
+        }, inplace=True)
         
-        # Sort by payment_date
-        journal_df = journal_df.sort_values('payment_date')
+        return df
+    
+    def _split_rows(self, df: pd.DataFrame, order: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Assign rows to journal types using masks computed once on the raw column arrays
         
-        return journal_df
+        Args:
+            df: Matched transactions or master journal DataFrame
+            order: Row positions of df in output order
+            
+        Returns:
+            Dictionary with journal type as key and row positions (in output order) as value
+        """
+        amounts = df['amount'].to_numpy(dtype=float)[order]
+        refund_mask = amounts < 0
+        remaining_mask = amounts >= 0
+        # Literal substring match on upper-cased invoice numbers (no case-insensitive regex)
+        poa_mask = df['invoice_number'].astype(str).str.upper().str.contains('POA', regex=False).to_numpy()[order]
+        cross_subsidiary_mask = df['billing_entity'].to_numpy(dtype=object)[order] != self.billing_entity
+        
+        non_poa_mask = remaining_mask & ~poa_mask
+        return {
+            # 1. REFUNDS JOURNAL (Negative amounts) - Double-Entry Format
+            'Refunds': order[refund_mask],
+            # 2. SALON SUMMIT INSTALLMENTS JOURNAL - TEMPORARILY DISABLED
+            # 3. POA JOURNAL (invoice contains "POA", positive amounts) - Simple Format
+            'POA': order[remaining_mask & poa_mask],
+            # 4. CROSS-SUBSIDIARY JOURNAL (different billing entity) - Simple Format
+            'Cross_Subsidiary': order[non_poa_mask & cross_subsidiary_mask],
+            # 5. MAIN JOURNAL (Regular transactions - same billing entity) - Simple Format
+            'Main': order[non_poa_mask & ~cross_subsidiary_mask]
+        }
     
     def split_journals(self, master_df: pd.DataFrame, memo: Optional[str] = None) -> Dict[str, pd.DataFrame]:
         """
@@ -359,47 +406,41 @@ class JournalBuilder:
             return {}
         
         journals = {}
+        for journal_type, positions in self._split_rows(master_df, np.arange(len(master_df))).items():
+            if not len(positions):
+                continue
+            journal_df = master_df.iloc[positions]
+            if journal_type == 'Refunds':
+                journal_df = self._generate_refunds_journal(journal_df, memo)
+            journals[f'{journal_type}_{self.subsidiary_name}'] = journal_df
         
-        # Get current subsidiary's billing entity
-        current_billing_entity = self.billing_entities.get(self.subsidiary_id, '')
+        return journals
+    
+    def _build_and_split(self, memo: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Build the split journals straight from the matched transactions in one pass
+        Rows are assigned to journals on the raw data and only each journal's rows are formatted,
+        so the full master journal is never materialized
         
-        # 1. REFUNDS JOURNAL (Negative amounts) - Double-Entry Format
-        refunds_df = master_df[master_df['amount'] < 0].copy()
-        if not refunds_df.empty:
-            refunds_journal = self._generate_refunds_journal(refunds_df, memo)
-            journals[f'Refunds_{self.subsidiary_name}'] = refunds_journal
+        Args:
+            memo: User-entered memo for journal entries
+            
+        Returns:
+            Dictionary with journal type as key and DataFrame as value
+        """
+        df = self.get_matched_transactions()
         
-        # Get remaining transactions (positive amounts)
-        remaining_df = master_df[master_df['amount'] >= 0].copy()
+        if df.empty:
+            return {}
         
-        if not remaining_df.empty:
-            # 2. SALON SUMMIT INSTALLMENTS JOURNAL - TEMPORARILY DISABLED
-            # installment_mask = remaining_df.get('match_type', '').str.contains('Salon Summit Installment', case=False, na=False)
-            # installment_df = remaining_df[installment_mask].copy()
-            # if not installment_df.empty:
-            #     journals[f'Salon_Summit_Installments_{self.subsidiary_name}'] = installment_df
-            
-            # 3. POA JOURNAL (invoice contains "POA") - Simple Format
-            if not remaining_df.empty:
-                poa_mask = remaining_df['invoice_number'].astype(str).str.contains('POA', case=False, na=False)
-                poa_df = remaining_df[poa_mask].copy()
-                if not poa_df.empty:
-                    journals[f'POA_{self.subsidiary_name}'] = poa_df
-                
-                # 4. CROSS-SUBSIDIARY JOURNAL (different billing entity) - Simple Format
-                non_poa_df = remaining_df[~poa_mask].copy()
-                if not non_poa_df.empty:
-                    # Define current subsidiary billing entity
-                    current_subsidiary_entity = self.billing_entities.get(self.subsidiary_id, "")
-                    cross_subsidiary_mask = non_poa_df['billing_entity'] != current_subsidiary_entity
-                    cross_subsidiary_df = non_poa_df[cross_subsidiary_mask].copy()
-                    if not cross_subsidiary_df.empty:
-                        journals[f'Cross_Subsidiary_{self.subsidiary_name}'] = cross_subsidiary_df
-                    
-                    # 5. MAIN JOURNAL (Regular transactions - same billing entity) - Simple Format
-                    main_df = non_poa_df[~cross_subsidiary_mask].copy()
-                    if not main_df.empty:
-                        journals[f'Main_{self.subsidiary_name}'] = main_df
+        journals = {}
+        for journal_type, positions in self._split_rows(df, self._get_sorted_positions()).items():
+            if not len(positions):
+                continue
+            journal_df = self._format_journal_rows(df.iloc[positions], memo)
+            if journal_type == 'Refunds':
+                journal_df = self._generate_refunds_journal(journal_df, memo)
+            journals[f'{journal_type}_{self.subsidiary_name}'] = journal_df
         
         return journals
     
@@ -415,38 +456,25 @@ class JournalBuilder:
         Returns:
             DataFrame in double-entry format with Dr/Cr columns
         """
-        from datetime import datetime
-        import calendar
-        
         if refunds_df.empty:
             return pd.DataFrame()
         
-        journal_entries = []
-        
         # Get the month and year from the first transaction to calculate EOM
-        if not refunds_df.empty and 'payment_date' in refunds_df.columns:
-            first_date_str = str(refunds_df.iloc[0]['payment_date'])
-            try:
-                # Try parsing dd/mm/yyyy format
-                if '/' in first_date_str:
-                    parts = first_date_str.split('/')
-                    if len(parts) == 3:
-                        day, month, year = parts
-                        month = int(month)
-                        year = int(year)
-                else:
-                    # Try parsing yyyy-mm-dd format
-                    first_date = datetime.strptime(first_date_str[:10], '%Y-%m-%d')
-                    month = first_date.month
-                    year = first_date.year
-                
-                # Calculate end of month
-                last_day = calendar.monthrange(year, month)[1]
-                eom_date = f"{last_day:02d}/{month:02d}/{year}"
-            except:
-                # Fallback to generic EOM
-                eom_date = "30/09/2025"
+        first_date = pd.NaT
+        if 'payment_date' in refunds_df.columns:
+            first_date_str = str(refunds_df['payment_date'].iloc[0])
+            if '/' in first_date_str:
+                # dd/mm/yyyy format - only month and year are needed
+                first_date = pd.to_datetime(first_date_str.split('/', 1)[1], format='%m/%Y', errors='coerce')
+            else:
+                # yyyy-mm-dd format (optionally followed by a time)
+                first_date = pd.to_datetime(first_date_str[:10], format='%Y-%m-%d', errors='coerce')
+        
+        if pd.notna(first_date):
+            # Roll forward to the end of the month
+            eom_date = (first_date + pd.offsets.MonthEnd(0)).strftime('%d/%m/%Y')
         else:
+            # Fallback to generic EOM
             eom_date = "30/09/2025"
         
         # Calculate total refund amount (sum of all negative amounts)
@@ -457,47 +485,25 @@ class JournalBuilder:
         billing_entity = first_refund['billing_entity']
         bank_account = first_refund['account']
         
-        # Process each refund transaction (individual Dr entries)
-        for idx, row in refunds_df.iterrows():
-            amount_abs = abs(row['amount'])
-            
-            # Individual Dr entry for each refund
-            entry = {
-                'Date': row['payment_date'],
-                'memo': memo if memo else 'MISC PAYMENT STRIPE',
-                'Entity': billing_entity,
-                'Name': row['client_id'],
-                'Account': '11010 Accounts Receivable : Trade Debtors',
-                'Management P&L': 'Balance Sheet',
-                'Dept.': 'Balance Sheet',
-                'Cost centre': 'Balance Sheet',
-                'Region': self.subsidiary_name,
-                'Dr': amount_abs,
-                'Cr': ''
-            }
-            journal_entries.append(entry)
-        
-        # Final Cr entry - Bank Account (total sum)
-        entry_cr = {
-            'Date': eom_date,
-            'memo': 'Refunds / Disputes',
+        # Build each column in one go: n individual Dr entries followed by the final Cr entry
+        # (Bank Account, total sum) - no per-row dicts
+        # Dr/Cr are float columns with NaN on the blank side (written as empty cells on export)
+        n = len(refunds_df)
+        region = self.subsidiary_name
+        refund_amounts = np.abs(refunds_df['amount'].to_numpy(dtype=float))
+        refunds_journal_df = pd.DataFrame({
+            'Date': np.append(refunds_df['payment_date'].to_numpy(dtype=object), eom_date),
+            'memo': [memo if memo else 'MISC PAYMENT STRIPE'] * n + ['Refunds / Disputes'],
             'Entity': billing_entity,
-            'Name': '',
-            'Account': bank_account,
+            'Name': np.append(refunds_df['client_id'].to_numpy(dtype=object), ''),
+            'Account': ['11010 Accounts Receivable : Trade Debtors'] * n + [bank_account],
             'Management P&L': 'Balance Sheet',
             'Dept.': 'Balance Sheet',
             'Cost centre': 'Balance Sheet',
-            'Region': self.subsidiary_name,
-            'Dr': '',
-            'Cr': total_refund_amount
-        }
-        journal_entries.append(entry_cr)
-        
-        # Create DataFrame with proper column order
-        refunds_journal_df = pd.DataFrame(journal_entries, columns=[
-            'Date', 'memo', 'Entity', 'Name', 'Account', 
-            'Management P&L', 'Dept.', 'Cost centre', 'Region', 'Dr', 'Cr'
-        ])
+            'Region': region,
+            'Dr': np.append(refund_amounts, np.nan),
+            'Cr': np.append(np.full(n, np.nan), total_refund_amount)
+        }, copy=False)
         
         return refunds_journal_df
     
@@ -514,6 +520,19 @@ class JournalBuilder:
         if df.empty:
             return df
         
+        # Create export dataframe with only these columns (column selection already returns a new frame)
+        return df[self._export_columns(df)]
+    
+    def _export_columns(self, df: pd.DataFrame) -> List[str]:
+        """
+        Cashbook upload columns present in the DataFrame, in export order
+        
+        Args:
+            df: Journal DataFrame
+            
+        Returns:
+            List of column names to export
+        """
         # The columns were already renamed in generate_master_journal
         # Just select the columns in the correct order, handling both naming conventions
         export_columns_mapping = {
@@ -543,40 +562,106 @@ class JournalBuilder:
             if col in df.columns:
                 available_columns.append(col)
         
-        # Create export dataframe with only these columns
-        export_df = df[available_columns].copy()
+        return available_columns
+    
+    def get_summary(self) -> Dict:
+        """
+        Get journal counts and totals with a single GROUP BY on matched_transactions
+        Buckets mirror _split_rows, so only a handful of rows come back instead of every transaction
         
-        return export_df
+        Returns:
+            Dictionary with master_count, master_total and per-journal count/total
+        """
+        table = self._matched_table
+        amount = table.c.stripe_amount
+        bucket = case(
+            (amount.is_(None), None),
+            (amount < 0, 'Refunds'),
+            (func.upper(table.c.cb_invoice_number).like('%POA%'), 'POA'),
+            (table.c.cb_billing_entity.is_distinct_from(self.billing_entity), 'Cross_Subsidiary'),
+            else_='Main'
+        ).label('bucket')
+        stmt = select(
+            bucket,
+            func.count().label('n'),
+            func.sum(amount).label('total')
+        ).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id
+        ).group_by(bucket)
+        
+        buckets = {}
+        master_count = 0
+        master_total = 0.0
+        for name, n, total in self.db.session.execute(stmt):
+            master_count += n
+            master_total += float(total or 0)
+            if name is not None:
+                buckets[name] = (n, float(total or 0))
+        
+        summary = {
+            'master_count': master_count,
+            'master_total': master_total,
+            'journals': {}
+        }
+        # Same journal order as _split_rows
+        for journal_type in ('Refunds', 'POA', 'Cross_Subsidiary', 'Main'):
+            if journal_type not in buckets:
+                continue
+            n, total = buckets[journal_type]
+            if journal_type == 'Refunds':
+                # Refunds journal has one Dr line per refund plus the closing Cr line, totalled on Dr
+                n, total = n + 1, abs(total)
+            summary['journals'][f'{journal_type}_{self.subsidiary_name}'] = {
+                'count': n,
+                'total': total
+            }
+        
+        return summary
     
-    def generate_all(self, memo: Optional[str] = None) -> Dict:
+    def generate_all(self, memo: Optional[str] = None, summary_only: bool = False) -> Dict:
         """
         Generate all journals for this subsidiary
         
         Args:
             memo: Optional memo text
+            summary_only: Only compute counts/totals in SQL (get_summary) without building the journals
             
         Returns:
             Dictionary with status and journal information
         """
         try:
-            # Generate master journal
-            master_df = self.generate_master_journal(memo)
+            if summary_only:
+                summary = self.get_summary()
+                if not summary['master_count']:
+                    return {
+                        'success': False,
+                        'error': 'No matched transactions found'
+                    }
+                return {
+                    'success': True,
+                    'subsidiary': self.subsidiary_name,
+                    'summary': summary,
+                    'journal_names': list(summary['journals'].keys())
+                }
+            
+            matched_df = self.get_matched_transactions()
             
-            if master_df.empty:
+            if matched_df.empty:
                 return {
                     'success': False,
                     'error': 'No matched transactions found'
                 }
             
-            # Split into specific journals
-            journals = self.split_journals(master_df, memo)
+            # Build the specific journals directly (the master journal itself is not needed here)
+            journals = self._build_and_split(memo)
             
             # Salon Summit Installments disabled
             
-            # Calculate summary
+            # Calculate summary (master total summed in payment_date order, same as the master journal)
             summary = {
-                'master_count': len(master_df),
-                'master_total': float(master_df['amount'].sum()),
+                'master_count': len(matched_df),
+                'master_total': float(matched_df['amount'].iloc[self._get_sorted_positions()].sum()),
                 'journals': {}
             }
             
@@ -584,7 +669,7 @@ class JournalBuilder:
                 # For refunds journal, sum Dr column; for others, sum amount column
                 if 'Refunds_' in journal_name and 'Dr' in journal_df.columns:
                     # Refunds journal uses Dr/Cr format - sum the Dr column for total
-                    total = float(journal_df['Dr'].replace('', 0).infer_objects(copy=False).sum())
+                    total = float(np.nansum(journal_df['Dr'].to_numpy()))
                 else:
                     # Regular journals use amount column
                     total = float(journal_df['amount'].sum()) if 'amount' in journal_df.columns else 0
@@ -619,17 +704,95 @@ class JournalBuilder:
         Returns:
             BytesIO object containing the CSV file
         """
+        export_columns = self._csv_columns(journal_df)
+        
+        # Create CSV file in memory (no formatting, just raw CSV) - pandas encodes into the buffer chunk by chunk
+        output = io.BytesIO()
+        journal_df.to_csv(output, columns=export_columns, index=False, encoding='utf-8', na_rep='')
+        output.seek(0)
+        return output
+    
+    def export_journal_iter(self, journal_df: pd.DataFrame, journal_name: str, chunk_size: int = 50000):
+        """
+        Export a journal DataFrame as CSV bytes, one chunk of rows at a time
+        Produces the same bytes as export_journal_to_csv without holding the whole file in memory
+        
+        Args:
+            journal_df: DataFrame to export
+            journal_name: Name of the journal
+            chunk_size: Number of rows encoded per chunk
+            
+        Yields:
+            UTF-8 encoded CSV chunks (the first chunk includes the header)
+        """
+        export_columns = self._csv_columns(journal_df)
+        
+        # range() must yield at least once so an empty journal still produces its header
+        for start in range(0, max(len(journal_df), 1), chunk_size):
+            chunk = journal_df.iloc[start:start + chunk_size]
+            yield chunk.to_csv(columns=export_columns, index=False, header=(start == 0), na_rep='').encode('utf-8')
+    
+    def _csv_columns(self, journal_df: pd.DataFrame) -> Optional[List[str]]:
+        """Columns to write for a journal CSV (None = all columns)"""
         # Check if this is a refunds journal (has Dr/Cr columns)
         if 'Dr' in journal_df.columns and 'Cr' in journal_df.columns:
             # Refunds journal - already in correct format, export as-is
+            return None
+        
+        # Regular journal - export the cashbook columns straight from the journal (no intermediate copy)
+        return self._export_columns(journal_df)
+    
+    def prepare_journal_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Normalize journal column types before writing to Excel
+        All formatting is done column-wise (no per-row apply/iterrows)
+    
+        Args:
+            df: Journal DataFrame to prepare
+    
+        Returns:
+            New DataFrame with numeric columns coerced and money columns rounded
+        """
+        if df.empty:
+            return df
+    
+        # Shallow copy - columns are replaced below, never modified in place
+        prepared = df.copy(deep=False)
+    
+        # Coerce numeric columns (blank Dr/Cr cells become NaN -> empty Excel cells)
+        for col in self.NUMERIC_COLUMNS:
+            if col in prepared.columns:
+                prepared[col] = pd.to_numeric(prepared[col], errors='coerce')
+    
+        # Round all money columns to cents in one operation (exchange rates keep full precision)
+        money_columns = [col for col in self.MONEY_COLUMNS if col in prepared.columns]
+        if money_columns:
+            prepared[money_columns] = prepared[money_columns].round(2)
+    
+        return prepared
+    
+    def export_journal_to_excel(self, journal_df: pd.DataFrame, journal_name: str) -> io.BytesIO:
+        """
+        Export a journal DataFrame to Excel format
+    
+        Args:
+            journal_df: DataFrame to export
+            journal_name: Name of the journal (used as the sheet name)
+    
+        Returns:
+            BytesIO object containing the XLSX file
+        """
+        if 'Dr' in journal_df.columns and 'Cr' in journal_df.columns:
             export_df = journal_df
         else:
-            # Regular journal - format for export
             export_df = self.format_for_export(journal_df)
-        
-        # Create CSV file in memory (no formatting, just raw CSV)
+    
+        export_df = self.prepare_journal_df(export_df)
+    
         output = io.BytesIO()
-        export_df.to_csv(output, index=False, encoding='utf-8')
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            # Excel limits sheet names to 31 characters
+            export_df.to_excel(writer, sheet_name=journal_name[:31], index=False)
         output.seek(0)
         return output
     
@@ -647,9 +810,21 @@ class JournalBuilder:
             cleaned = '-' + cleaned[1:-1]
         return float(cleaned) if cleaned else 0.0
     
+    @staticmethod
+    def _clean_amount_series(amounts: pd.Series) -> pd.Series:
+        """
+        Vectorized _clean_amount for a whole column (remove commas, spaces, handle parentheses)
+        Missing or blank values become 0.0; unparseable values raise ValueError like the scalar version
+        """
+        cleaned = amounts.astype('string').str.replace(',', '', regex=False).str.strip()
+        negative = (cleaned.str.startswith('(') & cleaned.str.endswith(')')).fillna(False)
+        cleaned = cleaned.mask(negative, '-' + cleaned.str.slice(1, -1))
+        cleaned = cleaned.mask((cleaned == '').fillna(False))
+        return pd.to_numeric(cleaned, errors='raise').fillna(0.0).astype(float)
+    
     def _get_existing_journal_transactions(self):
         """Get existing journal transactions for matching (EXCLUDE REFUNDS)"""
-        JournalTransaction = self.models.get('JournalTransaction')
+        JournalTransaction = self.JournalTransaction
         if not JournalTransaction:
             return []
         
@@ -678,8 +853,12 @@ class JournalBuilder:
         import os
         from datetime import datetime
         
-        # Create summary data
-        summary_data = []
+        # Create summary data (one list per output column)
+        client_ids = []
+        individual_installments = []
+        total_installments = []
+        statuses = []
+        installment_counts = []
         matched_count = 0
         unmatched_count = 0
         
@@ -687,7 +866,7 @@ class JournalBuilder:
             total_installment = sum(installments)
             
             # Check if this client was processed (has a journal entry)
-            JournalTransaction = self.models.get('JournalTransaction')
+            JournalTransaction = self.JournalTransaction
             if JournalTransaction:
                 existing_entry = JournalTransaction.query.filter_by(
                     job_id=self.job_id,
@@ -706,17 +885,20 @@ class JournalBuilder:
                 status = "ERROR"
                 unmatched_count += 1
             
-            summary_data.append({
-                'Client_ID': client_id,
-                'Individual_Installments': '; '.join([f'${amt:.2f}' for amt in installments]),
-                'Total_Installment': f'${total_installment:.2f}',
-                'Status': status,
-                'Installment_Count': len(installments)
-            })
-        
-        # Create DataFrame and save to CSV
-        import pandas as pd
-        summary_df = pd.DataFrame(summary_data)
+            client_ids.append(client_id)
+            individual_installments.append('; '.join([f'${amt:.2f}' for amt in installments]))
+            total_installments.append(f'${total_installment:.2f}')
+            statuses.append(status)
+            installment_counts.append(len(installments))
+        
+        # Create DataFrame from the column lists (no per-row dicts) and save to CSV
+        summary_df = pd.DataFrame({
+            'Client_ID': client_ids,
+            'Individual_Installments': individual_installments,
+            'Total_Installment': total_installments,
+            'Status': statuses,
+            'Installment_Count': installment_counts
+        }, copy=False)
         
         # Sort by status (MATCHED first, then NOT FOUND)
         summary_df = summary_df.sort_values(['Status', 'Client_ID'])
@@ -731,58 +913,37 @@ class JournalBuilder:
         
         return filepath
     
-    def _create_installment_journal(self, original_journal, installment_amount, memo):
-        """Create Salon Summit Installment journal entry"""
-        JournalTransaction = self.models.get('JournalTransaction')
+    def _create_installment_journal(self, original_journal, installment_amount, memo, synced_at=None):
+        """
+        Create Salon Summit Installment journal entry
+        
+        Pass synced_at to share one timestamp across a batch of installments
+        """
+        JournalTransaction = self.JournalTransaction
         if not JournalTransaction:
             return None
         
+        # Copy all unchanged data from original journal
+        fields = {field: getattr(original_journal, field) for field in self.INSTALLMENT_COPY_FIELDS}
+        
+        # Source values for the derived fields, each read once
+        invoice_number = fields['cb_invoice_number']
+        payment_date = fields['cb_payment_date']
+        invoice_hash = original_journal.cb_invoice_hash
+        payment_hash = original_journal.cb_payment_hash
+        
         # Create new journal transaction for installment
         installment_journal = JournalTransaction(
-            job_id=original_journal.job_id,
-            subsidiary_id=original_journal.subsidiary_id,
-            matched_transaction_id=original_journal.matched_transaction_id,
+            **fields,
             journal_type='Salon Summit Installments',
             journal_memo=memo or 'Salon Summit Installment',
-            journal_invoice_number=f"CPMT: {original_journal.cb_invoice_number}-INSTALLMENT" if original_journal.cb_invoice_number else None,
-            journal_payment_number=f"CPMT: {original_journal.cb_invoice_number}-{original_journal.cb_payment_date}-summit" if original_journal.cb_invoice_number else None,
-            last_synced_at=datetime.utcnow(),
-            # Copy all data from original journal
-            cb_payment_date=original_journal.cb_payment_date,
-            cb_client_id=original_journal.cb_client_id,
-            cb_invoice_number=original_journal.cb_invoice_number,
-            cb_billing_entity=original_journal.cb_billing_entity,
-            cb_ar_account=original_journal.cb_ar_account,
-            cb_currency=original_journal.cb_currency,
-            cb_exchange_rate=original_journal.cb_exchange_rate,
+            journal_invoice_number=f"CPMT: {invoice_number}-INSTALLMENT" if invoice_number else None,
+            journal_payment_number=f"CPMT: {invoice_number}-{payment_date}-summit" if invoice_number else None,
+            last_synced_at=synced_at or datetime.utcnow(),
             cb_amount=installment_amount,  # Use installment amount
-            cb_account=original_journal.cb_account,
-            cb_location=original_journal.cb_location,
-            cb_transtype=original_journal.cb_transtype,
-            cb_comment=original_journal.cb_comment,
-            cb_card_reference=original_journal.cb_card_reference,
-            cb_reasoncode=original_journal.cb_reasoncode,
-            cb_sepaprovider=original_journal.cb_sepaprovider,
-            cb_invoice_hash=f"{original_journal.cb_invoice_hash}-summit" if original_journal.cb_invoice_hash else None,
-            cb_payment_hash=f"{original_journal.cb_payment_hash}-summit" if original_journal.cb_payment_hash else None,
-            cb_memo=original_journal.cb_memo,
-            stripe_client_number=original_journal.stripe_client_number,
-            stripe_type=original_journal.stripe_type,
-            stripe_stripe_id=original_journal.stripe_stripe_id,
-            stripe_created=original_journal.stripe_created,
-            stripe_description=original_journal.stripe_description,
-            stripe_amount=installment_amount,  # Use installment amount
-            stripe_currency=original_journal.stripe_currency,
-            stripe_converted_amount=original_journal.stripe_converted_amount,
-            stripe_fees=original_journal.stripe_fees,
-            stripe_net=original_journal.stripe_net,
-            stripe_converted_currency=original_journal.stripe_converted_currency,
-            stripe_details=original_journal.stripe_details,
-            stripe_customer_id=original_journal.stripe_customer_id,
-            stripe_customer_email=original_journal.stripe_customer_email,
-            stripe_customer_name=original_journal.stripe_customer_name,
-            stripe_purpose_metadata=original_journal.stripe_purpose_metadata,
-            stripe_phorest_client_id_metadata=original_journal.stripe_phorest_client_id_metadata
+            cb_invoice_hash=f"{invoice_hash}-summit" if invoice_hash else None,
+            cb_payment_hash=f"{payment_hash}-summit" if payment_hash else None,
+            stripe_amount=installment_amount  # Use installment amount
         )
         
         self.db.session.add(installment_journal)
@@ -811,34 +972,31 @@ class JournalBuilder:
         Adjust amounts for clients that have Salon Summit Installments
         Main Journal should show remaining amounts (original - installment)
         """
-        JournalTransaction = self.models.get('JournalTransaction')
+        JournalTransaction = self.JournalTransaction
         if not JournalTransaction:
             return df
         
-        # Get all Salon Summit Installment transactions
-        installments = JournalTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id,
-            journal_type='Salon Summit Installments'
-        ).all()
-        
-        if not installments:
+        # Total Salon Summit Installment amount per client, aggregated in the database
+        # (installments without a client id never matched a transaction and are skipped)
+        stmt = select(
+            JournalTransaction.cb_client_id,
+            func.coalesce(func.sum(JournalTransaction.cb_amount), 0)
+        ).where(
+            JournalTransaction.job_id == self.job_id,
+            JournalTransaction.subsidiary_id == self.subsidiary_id,
+            JournalTransaction.journal_type == 'Salon Summit Installments',
+            JournalTransaction.cb_client_id.isnot(None)
+        ).group_by(JournalTransaction.cb_client_id)
+        installment_totals = pd.Series(dict(self.db.session.execute(stmt).all()), dtype=float)
+        
+        if installment_totals.empty:
             return df
         
-        # Create a mapping of client_id to installment amount
-        installment_map = {}
-        for inst in installments:
-            client_id = inst.cb_client_id
-            installment_amount = inst.cb_amount
-            if client_id in installment_map:
-                installment_map[client_id] += installment_amount or 0
-            else:
-                installment_map[client_id] = installment_amount or 0
-        
-        # Adjust amounts in the dataframe
-        for client_id, installment_amount in installment_map.items():
-            mask = df['client_id'] == client_id
-            df.loc[mask, 'amount'] = df.loc[mask, 'amount'] - installment_amount
+        # Adjust amounts in the dataframe: one hashed lookup per row into the per-client totals,
+        # then a plain ndarray subtract (clients without installments subtract 0)
+        positions = installment_totals.index.get_indexer(df['client_id'])
+        adjustments = np.where(positions >= 0, installment_totals.to_numpy()[positions], 0.0)
+        df['amount'] = df['amount'].to_numpy(dtype=float) - adjustments
         
         return df
     
@@ -4,10 +4,12 @@ Handles AED currency transactions separately from EUR transactions
 """
 
 import pandas as pd
+import numpy as np
 import io
 from typing import Dict, Optional
 from datetime import datetime
 import calendar
+from sqlalchemy import select
 
 
 class JournalBuilderEU:
@@ -22,6 +24,46 @@ class JournalBuilderEU:
     5. AED Journal (original AED amounts)
     """
     
+    # (DataFrame column, MatchedTransaction column) pairs for the matched transactions frame
+    MATCHED_FIELDS = (
+        ('payment_date', 'cb_payment_date'),
+        ('client_id', 'cb_client_id'),
+        ('invoice_number', 'cb_invoice_number'),
+        ('billing_entity', 'cb_billing_entity'),
+        ('ar_account', 'cb_ar_account'),
+        ('currency', 'cb_currency'),
+        ('exchange_rate', 'cb_exchange_rate'),
+        ('amount', 'stripe_amount'),  # Use stripe_amount (same as reconciliation)
+        ('account', 'cb_account'),
+        ('location', 'cb_location'),
+        ('transtype', 'cb_transtype'),
+        ('comment', 'cb_comment'),
+        ('card_reference', 'cb_card_reference'),
+        ('reasoncode', 'cb_reasoncode'),
+        ('sepaprovider', 'cb_sepaprovider'),
+        ('invoice_hash', 'cb_invoice_hash'),
+        ('payment_hash', 'cb_payment_hash'),
+        ('memo', 'cb_memo'),
+        # Stripe data for AED handling
+        ('stripe_currency', 'stripe_currency'),
+        ('stripe_converted_amount', 'stripe_converted_amount')
+    )
+    
+    # Low-cardinality matched transaction columns stored as categoricals
+    CATEGORY_COLUMNS = (
+        'billing_entity', 'ar_account', 'currency', 'account', 'location', 'transtype', 'sepaprovider'
+    )
+    
+    # Rows fetched per round-trip when streaming matched transactions
+    YIELD_PER = 2000
+    
+    # Split journals in output order, indexed by bucket code (EUR codes 0-3, AED codes 4-7)
+    # Cross-subsidiary is checked FIRST (matches Master Upload logic), then refunds, then POA
+    JOURNAL_NAMES = (
+        'Cross_Subsidiary_EU', 'Refunds_EU', 'POA_EU', 'Main_EU',
+        'Cross_Subsidiary_AED', 'Refunds_AED', 'POA_AED', 'Main_AED'
+    )
+    
     def __init__(self, db, job_id: int, subsidiary_id: int, models=None):
         self.db = db
         self.job_id = job_id
@@ -29,60 +71,53 @@ class JournalBuilderEU:
         self.models = models or {}
         self.subsidiary_name = "EU"
         self.billing_entity = "Ndevor Systems Ltd : Phorest Ireland"
+        
+        # Resolve the model class and its Core table once (fail fast if it is missing)
+        self.MatchedTransaction = (
+            self.models.get('MatchedTransaction')
+            or self.db.Model.registry._class_registry.get('MatchedTransaction')
+        )
+        if not self.MatchedTransaction:
+            raise ValueError("MatchedTransaction model not available")
+        self._matched_table = self.MatchedTransaction.__table__
     
     def get_matched_transactions(self) -> pd.DataFrame:
         """
         Get all matched transactions from MatchedTransaction table
         Same source as reconciliation and master upload
         """
-        if 'MatchedTransaction' in self.models:
-            MatchedTransaction = self.models['MatchedTransaction']
-        else:
-            MatchedTransaction = self.db.Model.registry._class_registry.data.get('MatchedTransaction')
+        # Core select streamed in batches - plain tuples, no ORM instances or attribute instrumentation
+        table = self._matched_table
+        stmt = select(*[table.c[source] for _, source in self.MATCHED_FIELDS]).where(
+            table.c.job_id == self.job_id,
+            table.c.subsidiary_id == self.subsidiary_id
+        ).order_by(table.c.id).execution_options(yield_per=self.YIELD_PER)
         
-        if not MatchedTransaction:
-            raise ValueError("MatchedTransaction model not available")
+        # One list per column, extended a batch at a time (no dict per row)
+        columns = [[] for _ in self.MATCHED_FIELDS]
+        for partition in self.db.session.execute(stmt).partitions():
+            for column, values in zip(columns, zip(*partition)):
+                column.extend(values)
         
-        matches = MatchedTransaction.query.filter_by(
-            job_id=self.job_id,
-            subsidiary_id=self.subsidiary_id
-        ).all()
-        
-        if not matches:
+        if not columns[0]:
             return pd.DataFrame()
         
-        data = []
-        for match in matches:
-            # Determine if this is AED or EUR transaction
-            is_aed = match.stripe_currency and match.stripe_currency.upper() == 'AED'
-            
-            row = {
-                'payment_date': match.cb_payment_date,
-                'client_id': match.cb_client_id,
-                'invoice_number': match.cb_invoice_number,
-                'billing_entity': match.cb_billing_entity,
-                'ar_account': match.cb_ar_account,
-                'currency': match.stripe_currency if is_aed else match.cb_currency,
-                'exchange_rate': match.cb_exchange_rate,
-                'amount': match.stripe_amount,  # Use stripe_amount (same as reconciliation)
-                'account': match.cb_account,
-                'location': match.cb_location,
-                'transtype': match.cb_transtype,
-                'comment': match.cb_comment,
-                'card_reference': match.cb_card_reference,
-                'reasoncode': match.cb_reasoncode,
-                'sepaprovider': match.cb_sepaprovider,
-                'invoice_hash': match.cb_invoice_hash,
-                'payment_hash': match.cb_payment_hash,
-                'memo': match.cb_memo,
-                # Stripe data for AED handling
-                'stripe_currency': match.stripe_currency,
-                'stripe_converted_amount': match.stripe_converted_amount,
-                'is_aed': is_aed
-            }
-            data.append(row)
+        df = pd.DataFrame({name: column for (name, _), column in zip(self.MATCHED_FIELDS, columns)})
+        
+        # Determine if each transaction is AED or EUR: upper-case only the distinct Stripe currencies,
+        # then broadcast to the rows through the category codes (code -1 = no Stripe currency)
+        stripe_currency = pd.Categorical(df['stripe_currency'])
+        currencies_upper = stripe_currency.categories.str.upper()
+        is_aed = np.append(currencies_upper == 'AED', False)[stripe_currency.codes]
+        has_currency = np.append(currencies_upper != '', False)[stripe_currency.codes]
+        df['currency'] = np.where(is_aed, df['stripe_currency'].to_numpy(), df['currency'].to_numpy())
+        # Rows without a Stripe currency are neither - is_aed is <NA> and they stay out of both journal sets
+        df['is_aed'] = pd.arrays.BooleanArray(is_aed, ~has_currency)
+        
+        # A handful of distinct values per column - int codes instead of one Python string per row
+        df = df.astype({col: 'category' for col in self.CATEGORY_COLUMNS}, copy=False)
         
-        return pd.DataFrame(data)
+        return df
     
     def generate_master_journal(self, memo: Optional[str] = None) -> pd.DataFrame:
         """
@@ -111,82 +146,44 @@ class JournalBuilderEU:
         if master_df.empty:
             return {}
         
+        return self._split_by_buckets(master_df, self._journal_buckets(master_df), memo)
+    
+    def _split_by_buckets(self, master_df: pd.DataFrame, buckets: pd.Categorical,
+                          memo: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """Partition the master frame by precomputed journal buckets (see _journal_buckets)"""
+        # Single groupby pass on the category codes
+        # (groups come back in JOURNAL_NAMES order, empty journals are skipped)
         journals = {}
-        
-        # STEP 1: Separate AED and EUR transactions
-        aed_df = master_df[master_df['is_aed'] == True].copy()
-        eur_df = master_df[master_df['is_aed'] == False].copy()
-        
-        # STEP 2: Process EUR transactions
-        if not eur_df.empty:
-            # Check for cross-subsidiary FIRST (matches Master Upload logic)
-            cross_mask_eur = eur_df['billing_entity'] != self.billing_entity
-            cross_eur_df = eur_df[cross_mask_eur].copy()
-            if not cross_eur_df.empty:
-                journals['Cross_Subsidiary_EU'] = cross_eur_df
-            
-            # Non-cross-subsidiary EUR transactions
-            non_cross_eur_df = eur_df[~cross_mask_eur].copy()
-            
-            if not non_cross_eur_df.empty:
+        for journal_name, journal_df in master_df.groupby(buckets, observed=True):
+            if journal_name.startswith('Refunds_'):
                 # Refunds (negative amounts, double-entry format)
-                refunds_eur_mask = non_cross_eur_df['amount'] < 0
-                refunds_eur_df = non_cross_eur_df[refunds_eur_mask].copy()
-                if not refunds_eur_df.empty:
-                    refunds_journal = self._generate_refunds_journal(refunds_eur_df, memo)
-                    journals['Refunds_EU'] = refunds_journal
-                
-                # Positive EUR transactions
-                positive_eur_df = non_cross_eur_df[~refunds_eur_mask].copy()
-                
-                if not positive_eur_df.empty:
-                    # POA Journal
-                    poa_eur_mask = positive_eur_df['invoice_number'].astype(str).str.contains('POA', case=False, na=False)
-                    poa_eur_df = positive_eur_df[poa_eur_mask].copy()
-                    if not poa_eur_df.empty:
-                        journals['POA_EU'] = poa_eur_df
-                    
-                    # Main Journal (Regular)
-                    main_eur_df = positive_eur_df[~poa_eur_mask].copy()
-                    if not main_eur_df.empty:
-                        journals['Main_EU'] = main_eur_df
-        
-        # STEP 3: Process AED transactions (SAME categorization logic as EUR)
-        if not aed_df.empty:
-            # Check for cross-subsidiary FIRST
-            cross_mask_aed = aed_df['billing_entity'] != self.billing_entity
-            cross_aed_df = aed_df[cross_mask_aed].copy()
-            if not cross_aed_df.empty:
-                journals['Cross_Subsidiary_AED'] = cross_aed_df
-            
-            # Non-cross-subsidiary AED transactions
-            non_cross_aed_df = aed_df[~cross_mask_aed].copy()
-            
-            if not non_cross_aed_df.empty:
-                # Refunds AED (negative amounts, double-entry format)
-                refunds_aed_mask = non_cross_aed_df['amount'] < 0
-                refunds_aed_df = non_cross_aed_df[refunds_aed_mask].copy()
-                if not refunds_aed_df.empty:
-                    refunds_aed_journal = self._generate_refunds_journal(refunds_aed_df, memo)
-                    journals['Refunds_AED'] = refunds_aed_journal
-                
-                # Positive AED transactions
-                positive_aed_df = non_cross_aed_df[~refunds_aed_mask].copy()
-                
-                if not positive_aed_df.empty:
-                    # POA AED
-                    poa_aed_mask = positive_aed_df['invoice_number'].astype(str).str.contains('POA', case=False, na=False)
-                    poa_aed_df = positive_aed_df[poa_aed_mask].copy()
-                    if not poa_aed_df.empty:
-                        journals['POA_AED'] = poa_aed_df
-                    
-                    # Main AED (Regular)
-                    main_aed_df = positive_aed_df[~poa_aed_mask].copy()
-                    if not main_aed_df.empty:
-                        journals['Main_AED'] = main_aed_df
+                journal_df = self._generate_refunds_journal(journal_df, memo)
+            journals[journal_name] = journal_df
         
         return journals
     
+    def _journal_buckets(self, master_df: pd.DataFrame) -> pd.Categorical:
+        """
+        Assign every master journal row to its split journal in one vectorized pass
+        
+        Returns:
+            Categorical over JOURNAL_NAMES (NaN for rows that belong to no journal)
+        """
+        # STEP 1: Evaluate every mask once over the whole master frame
+        # Currency bucket as int8: 1 = AED, 0 = EUR, -1 = no Stripe currency
+        currency_bucket = master_df['is_aed'].to_numpy(dtype=np.int8, na_value=-1)
+        cross_mask = (master_df['billing_entity'] != self.billing_entity).to_numpy()
+        refunds_mask = master_df['amount'].to_numpy(dtype=float) < 0
+        # Literal substring match on upper-cased invoice numbers (no case-insensitive regex)
+        poa_mask = master_df['invoice_number'].astype(str).str.upper().str.contains('POA', regex=False).to_numpy()
+        
+        # STEP 2: One bucket code per row (SAME categorization logic for EUR and AED), fused arithmetically:
+        # cross-subsidiary 0, else refund 1, else POA 2, else main 3; AED adds 4
+        codes = (~cross_mask) * (1 + (~refunds_mask) * (1 + ~poa_mask)) + currency_bucket * 4
+        # Rows that are neither EUR nor AED get code -1 (NaN category) and are left out
+        codes[currency_bucket < 0] = -1
+        return pd.Categorical.from_codes(codes, categories=self.JOURNAL_NAMES)
+    
     def _generate_refunds_journal(self, refunds_df: pd.DataFrame, memo: Optional[str] = None) -> pd.DataFrame:
         """
         Generate double-entry refunds journal
@@ -204,44 +201,36 @@ class JournalBuilderEU:
         if not memo:
             memo = f"{month_name} {year} Receipts"
         
-        refund_entries = []
+        # Each refund becomes a Debit (AR) line followed by its Credit (Bank) line,
+        # built column by column: shared fields are repeated, Dr/Cr/Account are interleaved
+        amounts = refunds_df['amount'].abs().to_numpy(dtype=float)  # Make positive for display
+        # Blank side of each line stays numeric (NaN) and is written as an empty cell
+        blanks = np.full(len(refunds_df), np.nan)
         
-        for _, refund in refunds_df.iterrows():
-            amount = abs(refund['amount'])  # Make positive for display
-            
-            # Debit entry (AR)
-            debit_entry = {
-                'Date': refund['payment_date'],
-                'Account': refund['ar_account'],
-                'Dr': amount,
-                'Cr': '',
-                'Billing Entity': refund['billing_entity'],
-                'Memo': memo,
-                'Currency': refund['currency'],
-                'Exchange Rate': refund['exchange_rate'],
-                'Location': refund['location'],
-                'Client #': refund['client_id'],
-                'Invoice #': refund['invoice_number']
-            }
-            refund_entries.append(debit_entry)
-            
-            # Credit entry (Bank)
-            credit_entry = {
-                'Date': refund['payment_date'],
-                'Account': refund['account'],
-                'Dr': '',
-                'Cr': amount,
-                'Billing Entity': refund['billing_entity'],
-                'Memo': memo,
-                'Currency': refund['currency'],
-                'Exchange Rate': refund['exchange_rate'],
-                'Location': refund['location'],
-                'Client #': refund['client_id'],
-                'Invoice #': refund['invoice_number']
-            }
-            refund_entries.append(credit_entry)
+        def repeated(column):
+            return refunds_df[column].to_numpy().repeat(2)
         
-        return pd.DataFrame(refund_entries)
+        return pd.DataFrame({
+            'Date': repeated('payment_date'),
+            'Account': self._interleave(refunds_df['ar_account'].to_numpy(), refunds_df['account'].to_numpy()),
+            'Dr': self._interleave(amounts, blanks),
+            'Cr': self._interleave(blanks, amounts),
+            'Billing Entity': repeated('billing_entity'),
+            'Memo': memo,
+            'Currency': repeated('currency'),
+            'Exchange Rate': repeated('exchange_rate'),
+            'Location': repeated('location'),
+            'Client #': repeated('client_id'),
+            'Invoice #': repeated('invoice_number')
+        })
+    
+    @staticmethod
+    def _interleave(debits: np.ndarray, credits: np.ndarray) -> np.ndarray:
+        """Alternate debit and credit values into one column (debit first)"""
+        values = np.empty(len(debits) * 2, dtype=np.result_type(debits, credits))
+        values[0::2] = debits
+        values[1::2] = credits
+        return values
     
     def generate_all(self, memo: Optional[str] = None) -> Dict:
         """
@@ -256,7 +245,17 @@ class JournalBuilderEU:
                     'error': 'No matched transactions found'
                 }
             
-            journals = self.split_journals(master_df, memo)
+            # Count, amount total and converted (EUR) total for every journal in one aggregation
+            # over the bucket codes - the journal frames themselves are not needed for the summary
+            buckets = self._journal_buckets(master_df)
+            journal_totals = pd.DataFrame({
+                'amount': master_df['amount'].to_numpy(dtype=float),
+                'stripe_eur': master_df['stripe_converted_amount'].to_numpy(dtype=float)
+            }).groupby(buckets, observed=True).agg(
+                count=('amount', 'size'),
+                total=('amount', 'sum'),
+                total_eur=('stripe_eur', 'sum')
+            )
             
             # Calculate summary for each journal
             summary = {
@@ -276,16 +275,16 @@ class JournalBuilderEU:
             combined_main = 0.0
             combined_cross_sub = 0.0
             
-            for journal_name, journal_df in journals.items():
-                if 'Refunds_' in journal_name and 'Dr' in journal_df.columns:
-                    # Refunds journal uses Dr/Cr format
-                    total = float(journal_df['Dr'].replace('', 0).astype(float).sum())
-                else:
-                    # Regular journals use amount column
-                    total = float(journal_df['amount'].sum()) if 'amount' in journal_df.columns else 0
+            for journal_name, count, total, converted_total in journal_totals.itertuples():
+                count = int(count)
+                total = float(total)
+                if journal_name.startswith('Refunds_'):
+                    # Refunds journal uses Dr/Cr format - 2 lines per refund, total is the Dr side
+                    count *= 2
+                    total = -total
                 
                 summary['journals'][journal_name] = {
-                    'count': len(journal_df),
+                    'count': count,
                     'total': total
                 }
                 
@@ -294,10 +293,8 @@ class JournalBuilderEU:
                 
                 if is_aed_journal:
                     # AED journal - need to convert for comparison
-                    if 'stripe_converted_amount' in journal_df.columns:
-                        total_eur = float(journal_df['stripe_converted_amount'].sum())
-                    else:
-                        total_eur = 0
+                    # (the Dr/Cr refunds journal carries no converted amounts, so it counts as 0)
+                    total_eur = 0 if journal_name.startswith('Refunds_') else float(converted_total)
                     aed_total_aed += total
                     aed_total_eur += total_eur
                 else:
@@ -343,7 +340,7 @@ class JournalBuilderEU:
                 'success': True,
                 'subsidiary': self.subsidiary_name,
                 'summary': summary,
-                'journal_names': list(journals.keys())
+                'journal_names': list(journal_totals.index)
             }
             
         except Exception as e:
@@ -359,6 +356,13 @@ class JournalBuilderEU:
         output.seek(0)
         return output
     
+    def export_journal_iter(self, df: pd.DataFrame, journal_name: str, chunk_size: int = 50000):
+        """Export journal DataFrame as UTF-8 CSV chunks (header in the first chunk) for streaming downloads"""
+        # range() must yield at least once so an empty journal still produces its header
+        for start in range(0, max(len(df), 1), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            yield chunk.to_csv(index=False, header=(start == 0)).encode('utf-8')
+    
     def export_all_journals(self, memo: Optional[str] = None) -> Dict[str, io.BytesIO]:
         """
         Export all EU journals as CSV files
@@ -8,11 +8,42 @@ HARD RULE: ONE-WAY SYNC ONLY
 """
 
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional
 import logging
+from sqlalchemy import String, case, delete, exists, func, insert, literal, null, or_, select, update
+from sqlalchemy.orm import load_only
 
 logger = logging.getLogger(__name__)
 
+# Rows streamed and flushed per batch by the row-by-row sync
+SYNC_BATCH_SIZE = 5000
+
+# JournalTransaction columns copied unchanged from MatchedTransaction
+COPY_FIELDS = (
+    'cb_payment_date', 'cb_client_id', 'cb_invoice_number', 'cb_billing_entity', 'cb_ar_account',
+    'cb_currency', 'cb_exchange_rate', 'cb_amount', 'cb_account', 'cb_location', 'cb_transtype',
+    'cb_comment', 'cb_card_reference', 'cb_reasoncode', 'cb_sepaprovider', 'cb_invoice_hash',
+    'cb_payment_hash', 'cb_memo',
+    'stripe_client_number', 'stripe_type', 'stripe_stripe_id', 'stripe_created', 'stripe_description',
+    'stripe_amount', 'stripe_currency', 'stripe_converted_amount', 'stripe_fees', 'stripe_net',
+    'stripe_converted_currency', 'stripe_details', 'stripe_customer_id', 'stripe_customer_email',
+    'stripe_customer_name', 'stripe_purpose_metadata', 'stripe_phorest_client_id_metadata'
+)
+
+
+@lru_cache(maxsize=8192)
+def _payment_number(invoice_number: str, date_str: Optional[str]) -> str:
+    """CPMT payment number for an invoice/date pair, cached for invoices repeated within a sync"""
+    if date_str:
+        # Extract just the date part if it's a datetime (dates are stored as strings;
+        # partition avoids the str() copies and the list split() builds)
+        if not isinstance(date_str, str):
+            date_str = str(date_str)
+        return f"CPMT: {invoice_number}-{date_str.partition(' ')[0]}"
+    
+    return f"CPMT: {invoice_number}"
+
 
 class JournalSync:
     """
@@ -41,55 +72,24 @@ class JournalSync:
         if not self.MatchedTransaction or not self.JournalTransaction:
             raise ValueError("Required models not available")
         
+        # One timestamp for the whole sync: every row touched is stamped "synced at T"
+        synced_at = datetime.utcnow()
+        
         try:
-            # Get all matched transactions for this job/subsidiary
-            matched_transactions = self.MatchedTransaction.query.filter_by(
-                job_id=job_id,
-                subsidiary_id=subsidiary_id
-            ).all()
-            
-            # Get existing journal transactions
-            existing_journal_transactions = self.JournalTransaction.query.filter_by(
-                job_id=job_id,
-                subsidiary_id=subsidiary_id
-            ).all()
-            
-            existing_ids = {jt.matched_transaction_id for jt in existing_journal_transactions}
-            
-            created_count = 0
-            updated_count = 0
-            
-            for match in matched_transactions:
-                # Skip Salon Summit Installments (they're handled separately)
-                if match.match_type == 'Salon Summit Installment':
-                    continue
-                
-                # Check if journal transaction already exists
-                existing_jt = next(
-                    (jt for jt in existing_journal_transactions 
-                     if jt.matched_transaction_id == match.id), 
-                    None
-                )
-                
-                if existing_jt:
-                    # Update existing journal transaction with latest data
-                    self._update_journal_transaction(existing_jt, match, memo)
-                    updated_count += 1
-                else:
-                    # Create new journal transaction
-                    self._create_journal_transaction(match, memo)
-                    created_count += 1
+            if self.db.session.get_bind().dialect.name == 'postgresql':
+                # Whole sync runs inside the database as set-oriented statements
+                result = self._sync_in_database(job_id, subsidiary_id, synced_at, memo)
+            else:
+                result = self._sync_row_by_row(job_id, subsidiary_id, synced_at, memo)
             
             # Commit all changes
             self.db.session.commit()
             
-            logger.info(f"Journal sync completed: {created_count} created, {updated_count} updated")
+            logger.info(f"Journal sync completed: {result['created_count']} created, {result['updated_count']} updated")
             
             return {
                 'success': True,
-                'created_count': created_count,
-                'updated_count': updated_count,
-                'total_matched': len(matched_transactions)
+                **result
             }
             
         except Exception as e:
@@ -97,11 +97,229 @@ class JournalSync:
             logger.error(f"Journal sync failed: {str(e)}")
             raise e
     
-    def _create_journal_transaction(self, match, memo: str = None):
-        """Create a new journal transaction from a matched transaction"""
-        journal_type = self._determine_journal_type(match)
+    def _sync_in_database(self, job_id: int, subsidiary_id: int, synced_at: datetime, memo: str = None) -> dict:
+        """
+        Sync with two set-oriented statements (PostgreSQL):
+        UPDATE ... FROM matched_transactions for journal rows that already exist,
+        then INSERT ... SELECT for matched transactions that have no journal row yet.
+        Journal type and invoice/payment numbers are computed in SQL; the payment number
+        follows the same rules as _generate_payment_number.
+        """
+        matched = self.MatchedTransaction.__table__
+        journal = self.JournalTransaction.__table__
+        
+        # Skip Salon Summit Installments (they're handled separately)
+        in_scope = (
+            matched.c.job_id == job_id,
+            matched.c.subsidiary_id == subsidiary_id,
+            matched.c.match_type != 'Salon Summit Installment'
+        )
+        
+        invoice_number = matched.c.cb_invoice_number
+        has_invoice = func.coalesce(invoice_number, '') != ''
+        # Use payment date if available, otherwise use created date (date part only)
+        date_str = func.coalesce(
+            func.nullif(matched.c.cb_payment_date, ''),
+            func.nullif(matched.c.stripe_created, '')
+        )
+        journal_invoice_number = case((has_invoice, 'CPMT: ' + invoice_number), else_=None)
+        journal_payment_number = case(
+            (~has_invoice, None),
+            (date_str.is_(None), 'CPMT: ' + invoice_number),
+            else_='CPMT: ' + invoice_number + '-' + func.split_part(date_str, ' ', 1, type_=String)
+        )
+        journal_type = self._journal_type_expression(matched)
+        
+        # First sync for this job/subsidiary: plain INSERT ... SELECT, no UPDATE and no anti-join
+        journal_scope = (journal.c.job_id == job_id, journal.c.subsidiary_id == subsidiary_id)
+        has_journals = self.db.session.execute(select(exists().where(*journal_scope))).scalar()
+        
+        updated_count = 0
+        source_filter = in_scope
+        if has_journals:
+            # Update existing journal transactions whose source data changed since the last sync
+            # (installment rows share the matched transaction id and are left alone)
+            values = {field: matched.c[field] for field in COPY_FIELDS}
+            values.update(
+                journal_invoice_number=journal_invoice_number,
+                journal_payment_number=journal_payment_number,
+                last_synced_at=synced_at
+            )
+            if memo:
+                values['journal_memo'] = memo
+            updated_count = self.db.session.execute(
+                update(journal).where(
+                    *journal_scope,
+                    journal.c.matched_transaction_id == matched.c.id,
+                    journal.c.journal_type.is_distinct_from('Salon Summit Installments'),
+                    *in_scope,
+                    self._journal_out_of_date(journal, matched, memo)
+                ).values(values)
+            ).rowcount
+            
+            # Only create journal transactions for matched transactions without one
+            journal_exists = exists().where(*journal_scope, journal.c.matched_transaction_id == matched.c.id)
+            source_filter = (*in_scope, ~journal_exists)
+        
+        source = select(
+            matched.c.job_id,
+            matched.c.subsidiary_id,
+            matched.c.id,
+            journal_type,
+            literal(memo, String),
+            journal_invoice_number,
+            journal_payment_number,
+            literal(synced_at),
+            literal(synced_at),
+            literal(synced_at),
+            *[matched.c[field] for field in COPY_FIELDS]
+        ).where(*source_filter)
+        created_count = self.db.session.execute(
+            insert(journal).from_select([
+                'job_id', 'subsidiary_id', 'matched_transaction_id', 'journal_type', 'journal_memo',
+                'journal_invoice_number', 'journal_payment_number', 'last_synced_at', 'created_at',
+                'updated_at', *COPY_FIELDS
+            ], source)
+        ).rowcount
+        
+        total_matched = self.db.session.execute(
+            select(func.count()).select_from(matched).where(
+                matched.c.job_id == job_id,
+                matched.c.subsidiary_id == subsidiary_id
+            )
+        ).scalar()
+        
+        return {
+            'created_count': created_count,
+            'updated_count': updated_count,
+            'total_matched': total_matched
+        }
+    
+    def _sync_row_by_row(self, job_id: int, subsidiary_id: int, synced_at: datetime, memo: str = None) -> dict:
+        """Fallback sync through the ORM for databases without the set-based path"""
+        MatchedTransaction = self.MatchedTransaction
+        JournalTransaction = self.JournalTransaction
+        
+        total_matched = MatchedTransaction.query.filter_by(
+            job_id=job_id,
+            subsidiary_id=subsidiary_id
+        ).count()
+        
+        # Stream matched transactions for this job/subsidiary batch by batch, with only the columns
+        # the sync reads; Salon Summit Installments are handled separately, so they are filtered out in the query
+        matched_transactions = self.db.session.query(MatchedTransaction).options(
+            load_only(
+                MatchedTransaction.job_id,
+                MatchedTransaction.subsidiary_id,
+                *[getattr(MatchedTransaction, field) for field in COPY_FIELDS]
+            )
+        ).add_columns(
+            self._journal_type_expression(MatchedTransaction.__table__)
+        ).filter(
+            MatchedTransaction.job_id == job_id,
+            MatchedTransaction.subsidiary_id == subsidiary_id,
+            MatchedTransaction.match_type != 'Salon Summit Installment'
+        )
         
-        journal_tx = self.JournalTransaction(
+        has_journals = self.db.session.query(JournalTransaction.query.filter_by(
+            job_id=job_id,
+            subsidiary_id=subsidiary_id
+        ).exists()).scalar()
+        
+        if has_journals:
+            # First existing journal transaction per matched transaction (installment rows can share the id)
+            first_journal = self.db.session.query(
+                JournalTransaction.matched_transaction_id,
+                func.min(JournalTransaction.id).label('journal_id')
+            ).filter_by(
+                job_id=job_id,
+                subsidiary_id=subsidiary_id
+            ).group_by(JournalTransaction.matched_transaction_id).subquery()
+            
+            # Pair each matched transaction with its journal transaction id (if any) in one LEFT JOIN
+            matched_transactions = matched_transactions.add_columns(
+                JournalTransaction.id,
+                self._journal_out_of_date(JournalTransaction.__table__, MatchedTransaction.__table__, memo)
+            ).outerjoin(
+                first_journal, first_journal.c.matched_transaction_id == MatchedTransaction.id
+            ).outerjoin(
+                JournalTransaction, JournalTransaction.id == first_journal.c.journal_id
+            )
+        else:
+            # First sync for this job/subsidiary: nothing to join against, every row is created
+            matched_transactions = matched_transactions.add_columns(null(), null())
+        
+        created_count = 0
+        updated_count = 0
+        new_rows = []
+        changed_rows = []
+        
+        for match, journal_type, journal_id, out_of_date in matched_transactions.yield_per(SYNC_BATCH_SIZE):
+            # No joined journal transaction means it has to be created
+            if journal_id is not None:
+                if not out_of_date:
+                    continue
+                # Update existing journal transaction with latest data
+                changed_rows.append(self._update_journal_transaction(journal_id, match, synced_at, memo))
+                updated_count += 1
+            else:
+                # Create new journal transaction
+                new_rows.append(self._create_journal_transaction(match, journal_type, synced_at, memo))
+                created_count += 1
+            
+            # Write batch by batch as plain mappings, bypassing the unit of work
+            if len(new_rows) + len(changed_rows) >= SYNC_BATCH_SIZE:
+                self._write_journal_rows(new_rows, changed_rows)
+        
+        self._write_journal_rows(new_rows, changed_rows)
+        
+        return {
+            'created_count': created_count,
+            'updated_count': updated_count,
+            'total_matched': total_matched
+        }
+    
+    def _journal_type_expression(self, matched):
+        """
+        SQL CASE classifying matched transactions into journal types:
+        negative Stripe amounts are Refunds, invoice numbers containing POA are POA, the rest Main.
+        Salon Summit Installments never reach the sync, they're handled separately.
+        """
+        return case(
+            (matched.c.stripe_amount < 0, 'Refunds'),
+            (func.upper(matched.c.cb_invoice_number).like('%POA%'), 'POA'),
+            else_='Main'
+        )
+    
+    def _journal_out_of_date(self, journal, matched, memo: str = None):
+        """
+        SQL condition that is true when a journal row no longer matches its matched transaction.
+        Journal invoice/payment numbers are derived from the copied columns, so comparing
+        those (and the memo, when one is being applied) is enough.
+        """
+        conditions = [journal.c[field].is_distinct_from(matched.c[field]) for field in COPY_FIELDS]
+        if memo:
+            conditions.append(journal.c.journal_memo.is_distinct_from(memo))
+        return or_(*conditions)
+    
+    def _write_journal_rows(self, new_rows: List[dict], changed_rows: List[dict]):
+        """
+        Bulk insert/update pending journal row mappings and empty the batches.
+        Lists of parameters run as one executemany each, which the driver batches
+        (multi-row INSERT ... VALUES via insertmanyvalues; UPDATE by primary key).
+        """
+        if new_rows:
+            self.db.session.execute(insert(self.JournalTransaction), new_rows)
+            new_rows.clear()
+        if changed_rows:
+            self.db.session.execute(update(self.JournalTransaction), changed_rows)
+            changed_rows.clear()
+    
+    def _create_journal_transaction(self, match, journal_type: str, synced_at: datetime, memo: str = None) -> dict:
+        """Build the row mapping for a new journal transaction from a matched transaction"""
+        # Copy all data from matched transaction
+        journal_tx = {field: getattr(match, field) for field in COPY_FIELDS}
+        journal_tx.update(
             job_id=match.job_id,
             subsidiary_id=match.subsidiary_id,
             matched_transaction_id=match.id,
@@ -109,124 +327,34 @@ class JournalSync:
             journal_memo=memo,
             journal_invoice_number=f"CPMT: {match.cb_invoice_number}" if match.cb_invoice_number else None,
             journal_payment_number=self._generate_payment_number(match),
-            last_synced_at=datetime.utcnow(),
-            # Copy all data from matched transaction
-            cb_payment_date=match.cb_payment_date,
-            cb_client_id=match.cb_client_id,
-            cb_invoice_number=match.cb_invoice_number,
-            cb_billing_entity=match.cb_billing_entity,
-            cb_ar_account=match.cb_ar_account,
-            cb_currency=match.cb_currency,
-            cb_exchange_rate=match.cb_exchange_rate,
-            cb_amount=match.cb_amount,
-            cb_account=match.cb_account,
-            cb_location=match.cb_location,
-            cb_transtype=match.cb_transtype,
-            cb_comment=match.cb_comment,
-            cb_card_reference=match.cb_card_reference,
-            cb_reasoncode=match.cb_reasoncode,
-            cb_sepaprovider=match.cb_sepaprovider,
-            cb_invoice_hash=match.cb_invoice_hash,
-            cb_payment_hash=match.cb_payment_hash,
-            cb_memo=match.cb_memo,
-            stripe_client_number=match.stripe_client_number,
-            stripe_type=match.stripe_type,
-            stripe_stripe_id=match.stripe_stripe_id,
-            stripe_created=match.stripe_created,
-            stripe_description=match.stripe_description,
-            stripe_amount=match.stripe_amount,
-            stripe_currency=match.stripe_currency,
-            stripe_converted_amount=match.stripe_converted_amount,
-            stripe_fees=match.stripe_fees,
-            stripe_net=match.stripe_net,
-            stripe_converted_currency=match.stripe_converted_currency,
-            stripe_details=match.stripe_details,
-            stripe_customer_id=match.stripe_customer_id,
-            stripe_customer_email=match.stripe_customer_email,
-            stripe_customer_name=match.stripe_customer_name,
-            stripe_purpose_metadata=match.stripe_purpose_metadata,
-            stripe_phorest_client_id_metadata=match.stripe_phorest_client_id_metadata
+            last_synced_at=synced_at
         )
         
-        self.db.session.add(journal_tx)
+        return journal_tx
     
-    def _update_journal_transaction(self, journal_tx, match, memo: str = None):
-        """Update existing journal transaction with latest data from matched transaction"""
-        # Update journal-specific fields
-        if memo:
-            journal_tx.journal_memo = memo
-        journal_tx.journal_invoice_number = f"CPMT: {match.cb_invoice_number}" if match.cb_invoice_number else None
-        journal_tx.journal_payment_number = self._generate_payment_number(match)
-        journal_tx.last_synced_at = datetime.utcnow()
-        
+    def _update_journal_transaction(self, journal_id: int, match, synced_at: datetime, memo: str = None) -> dict:
+        """Build the update mapping for an existing journal transaction with latest data from matched transaction"""
         # Update all copied data from matched transaction
-        journal_tx.cb_payment_date = match.cb_payment_date
-        journal_tx.cb_client_id = match.cb_client_id
-        journal_tx.cb_invoice_number = match.cb_invoice_number
-        journal_tx.cb_billing_entity = match.cb_billing_entity
-        journal_tx.cb_ar_account = match.cb_ar_account
-        journal_tx.cb_currency = match.cb_currency
-        journal_tx.cb_exchange_rate = match.cb_exchange_rate
-        journal_tx.cb_amount = match.cb_amount
-        journal_tx.cb_account = match.cb_account
-        journal_tx.cb_location = match.cb_location
-        journal_tx.cb_transtype = match.cb_transtype
-        journal_tx.cb_comment = match.cb_comment
-        journal_tx.cb_card_reference = match.cb_card_reference
-        journal_tx.cb_reasoncode = match.cb_reasoncode
-        journal_tx.cb_sepaprovider = match.cb_sepaprovider
-        journal_tx.cb_invoice_hash = match.cb_invoice_hash
-        journal_tx.cb_payment_hash = match.cb_payment_hash
-        journal_tx.cb_memo = match.cb_memo
-        journal_tx.stripe_client_number = match.stripe_client_number
-        journal_tx.stripe_type = match.stripe_type
-        journal_tx.stripe_stripe_id = match.stripe_stripe_id
-        journal_tx.stripe_created = match.stripe_created
-        journal_tx.stripe_description = match.stripe_description
-        journal_tx.stripe_amount = match.stripe_amount
-        journal_tx.stripe_currency = match.stripe_currency
-        journal_tx.stripe_converted_amount = match.stripe_converted_amount
-        journal_tx.stripe_fees = match.stripe_fees
-        journal_tx.stripe_net = match.stripe_net
-        journal_tx.stripe_converted_currency = match.stripe_converted_currency
-        journal_tx.stripe_details = match.stripe_details
-        journal_tx.stripe_customer_id = match.stripe_customer_id
-        journal_tx.stripe_customer_email = match.stripe_customer_email
-        journal_tx.stripe_customer_name = match.stripe_customer_name
-        journal_tx.stripe_purpose_metadata = match.stripe_purpose_metadata
-        journal_tx.stripe_phorest_client_id_metadata = match.stripe_phorest_client_id_metadata
-    
-    def _determine_journal_type(self, match) -> str:
-        """Determine journal type based on transaction characteristics"""
-        # Check for refunds (negative amounts)
-        if match.stripe_amount and match.stripe_amount < 0:
-            return "Refunds"
+        journal_tx = {field: getattr(match, field) for field in COPY_FIELDS}
+        journal_tx['id'] = journal_id
         
-        # Check for POA transactions
-        if match.cb_invoice_number and 'POA' in str(match.cb_invoice_number).upper():
-            return "POA"
-        
-        # Check for Salon Summit Installments
-        if match.match_type == 'Salon Summit Installment':
-            return "Salon Summit Installments"
+        # Update journal-specific fields
+        if memo:
+            journal_tx['journal_memo'] = memo
+        journal_tx['journal_invoice_number'] = f"CPMT: {match.cb_invoice_number}" if match.cb_invoice_number else None
+        journal_tx['journal_payment_number'] = self._generate_payment_number(match)
+        journal_tx['last_synced_at'] = synced_at
         
-        # Default to Main
-        return "Main"
+        return journal_tx
     
     def _generate_payment_number(self, match) -> str:
         """Generate payment number: CPMT: {invoice_number}-{date}"""
-        if not match.cb_invoice_number:
+        invoice_number = match.cb_invoice_number
+        if not invoice_number:
             return None
         
         # Use payment date if available, otherwise use created date
-        date_str = match.cb_payment_date or match.stripe_created
-        if date_str:
-            # Extract just the date part if it's a datetime
-            if ' ' in str(date_str):
-                date_str = str(date_str).split(' ')[0]
-            return f"CPMT: {match.cb_invoice_number}-{date_str}"
-        
-        return f"CPMT: {match.cb_invoice_number}"
+        return _payment_number(invoice_number, match.cb_payment_date or match.stripe_created)
     
     def get_journal_transactions(self, job_id: int, subsidiary_id: int, journal_type: str = None) -> List:
         """
@@ -263,10 +391,13 @@ class JournalSync:
             bool: Success status
         """
         try:
-            self.JournalTransaction.query.filter_by(
-                job_id=job_id,
-                subsidiary_id=subsidiary_id
-            ).delete()
+            # Single set-based DELETE; no need to reconcile objects in the session first
+            self.db.session.execute(
+                delete(self.JournalTransaction).where(
+                    self.JournalTransaction.job_id == job_id,
+                    self.JournalTransaction.subsidiary_id == subsidiary_id
+                ).execution_options(synchronize_session=False)
+            )
             
             self.db.session.commit()
             return True
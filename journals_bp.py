@@ -2,15 +2,40 @@
 Journals Processing Blueprint
 Handles the simplified Summit Installments workflow with dedicated tables
 """
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, Response, render_template, request, jsonify, send_file, stream_with_context
 from datetime import datetime
-import json
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import csv
+import gzip
+import io
 import os
+import zlib
+import numpy as np
+import pandas as pd
 
 # Create blueprint
 journals_bp = Blueprint('journals', __name__, url_prefix='/journals')
 
+# Rows per executemany when inserting generated results
+INSERT_BATCH_SIZE = 5000
+
+# Rows fetched per round trip when streaming journal rows
+STREAM_BATCH_SIZE = 5000
+
+# Expected journal types per region, in display order (subsidiary 4 is EU)
+EU_JOURNAL_TYPES = (
+    'Main_EU', 'POA_EU', 'Cross_Subsidiary_EU', 'Refunds_EU',  # EU EUR
+    'Main_AED', 'POA_AED', 'Cross_Subsidiary_AED', 'Refunds_AED'  # EU AED
+)
+NON_EU_JOURNAL_TYPES = ('Main', 'POA', 'Cross_Subsidiary')
+
+# Journal types accepted by upload_journals
+VALID_JOURNAL_TYPES = frozenset(NON_EU_JOURNAL_TYPES + EU_JOURNAL_TYPES)
+
+# Write buffer for generated CSV files (one flush per MiB instead of per 8 KiB)
+CSV_WRITE_BUFFER_SIZE = 1 << 20
+
 # Import db and models from app (will be set up when registering blueprint)
 db = None
 FPDataset = None
@@ -19,15 +44,97 @@ FPSummitInstallment = None
 FPProcessedJournal = None
 FPMatchResult = None
 
+# Core INSERT statements, built once in init_blueprint and reused for every executemany
+_JOURNAL_ROW_INSERT = None
+_SUMMIT_INSERT = None
+_MATCH_INSERT = None
+_PROCESSED_INSERT = None
+
 def init_blueprint(app_db, models):
     """Initialize the blueprint with database and models"""
     global db, FPDataset, FPJournalRow, FPSummitInstallment, FPProcessedJournal, FPMatchResult
+    global _JOURNAL_ROW_INSERT, _SUMMIT_INSERT, _MATCH_INSERT, _PROCESSED_INSERT
     db = app_db
     FPDataset = models['FPDataset']
     FPJournalRow = models['FPJournalRow']
     FPSummitInstallment = models['FPSummitInstallment']
     FPProcessedJournal = models['FPProcessedJournal']
     FPMatchResult = models['FPMatchResult']
+    _JOURNAL_ROW_INSERT = FPJournalRow.__table__.insert()
+    _SUMMIT_INSERT = FPSummitInstallment.__table__.insert()
+    _MATCH_INSERT = FPMatchResult.__table__.insert()
+    _PROCESSED_INSERT = FPProcessedJournal.__table__.insert()
+
+def _has_rows(query):
+    """True if the query matches any row (EXISTS, without fetching or counting rows)"""
+    return db.session.query(query.exists()).scalar()
+
+def _dataset_row_count(model, dataset_id):
+    """Scalar subquery counting a model's rows for one dataset"""
+    return db.select(db.func.count()).select_from(model).where(model.dataset_id == dataset_id).scalar_subquery()
+
+def _summit_totals_by_client(dataset_id):
+    """
+    Installment total per summit client, summed in the database.
+    Clients keep the order of their first installment. Ids are already trimmed on upload;
+    trimming here only merges any rows stored untrimmed.
+    """
+    summit_by_client = {}
+    for client_id, total in db.session.query(
+        FPSummitInstallment.client_id,
+        db.func.sum(FPSummitInstallment.installment_amount)
+    ).filter_by(dataset_id=dataset_id).group_by(
+        FPSummitInstallment.client_id
+    ).order_by(db.func.min(FPSummitInstallment.id)):
+        client_id = client_id.strip()
+        summit_by_client[client_id] = summit_by_client.get(client_id, 0) + total
+    return summit_by_client
+
+def _csv_row(row, headers, header_set):
+    """
+    One dict row as a value list in header order for csv.writer
+    (missing keys are blank and unknown keys are rejected, as csv.DictWriter does)
+    """
+    if not header_set.issuperset(row):
+        wrong_fields = row.keys() - header_set
+        raise ValueError("dict contains fields not in fieldnames: " + ", ".join(repr(x) for x in wrong_fields))
+    return [row.get(header, '') for header in headers]
+
+def _csv_values(rows, headers):
+    """Yield dict rows as value lists in header order for csv.writer"""
+    header_set = set(headers)
+    for row in rows:
+        yield _csv_row(row, headers, header_set)
+
+def _copy_rows(table, rows):
+    """
+    Load mapping rows into a table with COPY FROM STDIN on the session's connection
+    (PostgreSQL via psycopg 3 only; every row must have the same keys, and column defaults are not applied)
+    """
+    columns = list(rows[0])
+    cursor = db.session.connection().connection.cursor()
+    try:
+        with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([row[column] for column in columns])
+    finally:
+        cursor.close()
+
+def _gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks as they are produced"""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _write_csv(filepath, headers, rows):
+    """Write dict rows to a CSV file with the given header order"""
+    with open(filepath, 'w', buffering=CSV_WRITE_BUFFER_SIZE, newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(headers)
+        writer.writerows(_csv_values(rows, headers))
 
 @journals_bp.route('/')
 def index():
@@ -50,18 +157,19 @@ def get_status(job_id, subsidiary_id):
                 'message': 'No dataset found'
             })
         
-        # Check if summit data uploaded
-        summit_count = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).count()
-        
-        # Check if matching is complete
-        match_count = FPMatchResult.query.filter_by(dataset_id=dataset.id).count()
-        
-        # Check if processing complete
-        processed_count = FPProcessedJournal.query.filter_by(dataset_id=dataset.id).count()
+        # Summit, match and processed row counts in one round trip
+        summit_count, match_count, processed_count = db.session.query(
+            _dataset_row_count(FPSummitInstallment, dataset.id),
+            _dataset_row_count(FPMatchResult, dataset.id),
+            _dataset_row_count(FPProcessedJournal, dataset.id)
+        ).one()
         
         # Get original journal stats
-        original_count = FPJournalRow.query.filter_by(dataset_id=dataset.id).count()
-        original_total = db.session.query(db.func.sum(FPJournalRow.amount)).filter_by(dataset_id=dataset.id).scalar() or 0
+        original_count, original_total = db.session.query(
+            db.func.count(FPJournalRow.id),
+            db.func.sum(FPJournalRow.amount)
+        ).filter_by(dataset_id=dataset.id).one()
+        original_total = original_total or 0
         
         status = {
             'success': True,
@@ -79,18 +187,23 @@ def get_status(job_id, subsidiary_id):
         }
         
         if processed_count > 0:
-            # Get processed journal stats
-            processed_total = db.session.query(db.func.sum(FPProcessedJournal.amount)).filter_by(dataset_id=dataset.id).scalar() or 0
-            summit_total = db.session.query(db.func.sum(FPProcessedJournal.amount)).filter(
-                FPProcessedJournal.dataset_id == dataset.id,
-                FPProcessedJournal.journal_type == 'Salon_Summit_Installments'
-            ).scalar() or 0
+            # Get processed journal stats - count and total per journal type in one grouped query
+            type_stats = {
+                jtype: (count, total or 0)
+                for jtype, count, total in db.session.query(
+                    FPProcessedJournal.journal_type,
+                    db.func.count(FPProcessedJournal.id),
+                    db.func.sum(FPProcessedJournal.amount)
+                ).filter_by(dataset_id=dataset.id).group_by(FPProcessedJournal.journal_type)
+            }
+            processed_total = sum(total for _, total in type_stats.values())
+            summit_total = type_stats.get('Salon_Summit_Installments', (0, 0))[1]
             
             # Count rows per journal type
-            main_count = FPProcessedJournal.query.filter_by(dataset_id=dataset.id, journal_type='Main').count()
-            poa_count = FPProcessedJournal.query.filter_by(dataset_id=dataset.id, journal_type='POA').count()
-            cross_count = FPProcessedJournal.query.filter_by(dataset_id=dataset.id, journal_type='Cross_Subsidiary').count()
-            summit_count_generated = FPProcessedJournal.query.filter_by(dataset_id=dataset.id, journal_type='Salon_Summit_Installments').count()
+            main_count = type_stats.get('Main', (0, 0))[0]
+            poa_count = type_stats.get('POA', (0, 0))[0]
+            cross_count = type_stats.get('Cross_Subsidiary', (0, 0))[0]
+            summit_count_generated = type_stats.get('Salon_Summit_Installments', (0, 0))[0]
             
             status['processed_journals'] = {
                 'total': round(float(processed_total), 2),
@@ -117,43 +230,49 @@ def upload_summit(job_id, subsidiary_id):
             return jsonify({'success': False, 'error': 'Please upload at least one journal file first'}), 400
         
         # Check if at least one journal is uploaded (more flexible)
-        journal_count = FPJournalRow.query.filter_by(dataset_id=dataset.id).count()
-        if journal_count == 0:
+        if not _has_rows(FPJournalRow.query.filter_by(dataset_id=dataset.id)):
             return jsonify({'success': False, 'error': 'Please upload at least one journal file first'}), 400
         
         # Check if already uploaded
-        existing = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).first()
-        if existing:
+        if _has_rows(FPSummitInstallment.query.filter_by(dataset_id=dataset.id)):
             return jsonify({'success': False, 'error': 'Summit data already uploaded. Clear to re-upload.'}), 409
         
-        payload = request.get_json(force=True)
+        payload = orjson.loads(request.get_data(cache=False))
         summit_data = payload.get('summit_data', [])
         
         if not summit_data:
             return jsonify({'success': False, 'error': 'No summit data provided'}), 400
         
-        # Store in dedicated summit table
-        uploaded_count = 0
-        for item in summit_data:
-            client_id = str(item.get('oak_id', '')).strip()
-            region = str(item.get('region', '')).strip()
-            installment_amount = float(item.get('installment_amount', 0))
-            
-            if client_id and installment_amount != 0:
-                installment = FPSummitInstallment(
-                    dataset_id=dataset.id,
-                    job_id=job_id,
-                    subsidiary_id=subsidiary_id,
-                    client_id=client_id,
-                    region=region,
-                    installment_amount=installment_amount
-                )
-                db.session.add(installment)
-                uploaded_count += 1
+        # Coerce the whole upload at once with pandas, then store the kept rows in the
+        # dedicated summit table (plain mappings, inserted in bulk)
+        # Only absent keys take the defaults; an explicit null is str()'d / rejected like any other value
+        summit_df = pd.DataFrame({
+            'client_id': pd.Series([item.get('oak_id', '') for item in summit_data], dtype=object),
+            'region': pd.Series([item.get('region', '') for item in summit_data], dtype=object)
+        })
+        summit_df['client_id'] = summit_df['client_id'].astype(str).str.strip()
+        summit_df['region'] = summit_df['region'].astype(str).str.strip()
+        
+        raw_amounts = pd.Series([item.get('installment_amount', 0) for item in summit_data], dtype=object)
+        amounts = pd.to_numeric(raw_amounts, errors='coerce')
+        if amounts.isna().any():
+            # Reject the upload on the first amount that is not a number, with float()'s own error as before
+            float(raw_amounts[amounts.isna()].iloc[0])
+        summit_df['installment_amount'] = amounts.astype(float)
+        
+        summit_df = summit_df[(summit_df['client_id'] != '') & (summit_df['installment_amount'] != 0)]
+        summit_df = summit_df[['client_id', 'region', 'installment_amount']].assign(
+            dataset_id=dataset.id,
+            job_id=job_id,
+            subsidiary_id=subsidiary_id
+        )
+        installments = summit_df.to_dict('records')
         
+        for start in range(0, len(installments), INSERT_BATCH_SIZE):
+            db.session.execute(_SUMMIT_INSERT, installments[start:start + INSERT_BATCH_SIZE])
         db.session.commit()
         
-        return jsonify({'success': True, 'uploaded_count': uploaded_count})
+        return jsonify({'success': True, 'uploaded_count': len(installments)})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -173,46 +292,37 @@ def match_summit(job_id, subsidiary_id):
             return jsonify({'success': False, 'error': 'Please upload at least one journal file first'}), 400
         
         # Check if at least one journal uploaded
-        journal_count = FPJournalRow.query.filter_by(dataset_id=dataset.id).count()
-        if journal_count == 0:
+        if not _has_rows(FPJournalRow.query.filter_by(dataset_id=dataset.id)):
             return jsonify({'success': False, 'error': 'Please upload at least one journal file first'}), 400
         
-        # Check if summit data uploaded
-        summit_installments = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).all()
-        if not summit_installments:
+        # Check if summit data uploaded (installments combined per client)
+        summit_by_client = _summit_totals_by_client(dataset.id)
+        if not summit_by_client:
             return jsonify({'success': False, 'error': 'No summit data uploaded'}), 400
         
         # Check if already matched
-        existing_matches = FPMatchResult.query.filter_by(dataset_id=dataset.id).first()
-        if existing_matches:
+        if _has_rows(FPMatchResult.query.filter_by(dataset_id=dataset.id)):
             return jsonify({
                 'success': False,
                 'error': 'Summit already matched. Clear to re-match.'
             }), 409
         
-        # Get all journal rows and calculate total received per client
-        journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+        # Total received per client, summed in the database; ids that only differ by
+        # surrounding whitespace are merged after trimming
         client_totals = {}
-        
-        for row in journal_rows:
-            client_id = str(row.client_id).strip() if row.client_id else ''
+        for client_id, total in db.session.query(
+            FPJournalRow.client_id,
+            db.func.sum(FPJournalRow.amount)
+        ).filter_by(dataset_id=dataset.id).group_by(FPJournalRow.client_id):
+            client_id = client_id.strip() if client_id else ''
             if client_id:
-                if client_id not in client_totals:
-                    client_totals[client_id] = 0
-                client_totals[client_id] += (row.amount or 0)
-        
-        # Combine duplicate summit clients
-        summit_by_client = {}
-        for installment in summit_installments:
-            client_id = installment.client_id.strip()
-            if client_id not in summit_by_client:
-                summit_by_client[client_id] = 0
-            summit_by_client[client_id] += installment.installment_amount
-        
-        # Perform matching
+                client_totals[client_id] = client_totals.get(client_id, 0) + (total or 0)
+        
+        # Perform matching (results collected as plain rows, inserted in batches below)
         matched_count = 0
         insufficient_count = 0
         unmatched_count = 0
+        match_rows = []
         
         for client_id, installment_amount in summit_by_client.items():
             if installment_amount <= 0:
@@ -222,45 +332,34 @@ def match_summit(job_id, subsidiary_id):
             
             if client_id not in client_totals:
                 # Unmatched - client not found
-                match_result = FPMatchResult(
-                    dataset_id=dataset.id,
-                    job_id=job_id,
-                    subsidiary_id=subsidiary_id,
-                    client_id=client_id,
-                    match_status='unmatched',
-                    total_received=0,
-                    installment_amount=installment_amount,
-                    remaining_amount=0
-                )
+                match_status = 'unmatched'
+                remaining_amount = 0
                 unmatched_count += 1
             elif total_received < installment_amount:
                 # Insufficient - found but not enough
-                match_result = FPMatchResult(
-                    dataset_id=dataset.id,
-                    job_id=job_id,
-                    subsidiary_id=subsidiary_id,
-                    client_id=client_id,
-                    match_status='insufficient',
-                    total_received=total_received,
-                    installment_amount=installment_amount,
-                    remaining_amount=total_received - installment_amount  # Will be negative
-                )
+                match_status = 'insufficient'
+                remaining_amount = total_received - installment_amount  # Will be negative
                 insufficient_count += 1
             else:
                 # Matched - sufficient funds
-                match_result = FPMatchResult(
-                    dataset_id=dataset.id,
-                    job_id=job_id,
-                    subsidiary_id=subsidiary_id,
-                    client_id=client_id,
-                    match_status='matched',
-                    total_received=total_received,
-                    installment_amount=installment_amount,
-                    remaining_amount=total_received - installment_amount
-                )
+                match_status = 'matched'
+                remaining_amount = total_received - installment_amount
                 matched_count += 1
             
-            db.session.add(match_result)
+            match_rows.append({
+                'dataset_id': dataset.id,
+                'job_id': job_id,
+                'subsidiary_id': subsidiary_id,
+                'client_id': client_id,
+                'match_status': match_status,
+                'total_received': total_received,
+                'installment_amount': installment_amount,
+                'remaining_amount': remaining_amount
+            })
+        
+        # One executemany per batch instead of an INSERT per ORM object
+        for start in range(0, len(match_rows), INSERT_BATCH_SIZE):
+            db.session.execute(_MATCH_INSERT, match_rows[start:start + INSERT_BATCH_SIZE])
         
         db.session.commit()
         
@@ -296,27 +395,44 @@ def get_match_results(job_id, subsidiary_id):
                 'unmatched': []
             })
         
-        # Get all match results
-        all_matches = FPMatchResult.query.filter_by(dataset_id=dataset.id).all()
+        # Get all match results (plain column tuples), totalling matched rows as they are bucketed
+        all_matches = FPMatchResult.query.filter_by(dataset_id=dataset.id).with_entities(
+            FPMatchResult.client_id,
+            FPMatchResult.match_status,
+            FPMatchResult.total_received,
+            FPMatchResult.installment_amount,
+            FPMatchResult.remaining_amount
+        ).order_by(FPMatchResult.id)
         
         matched = []
         insufficient = []
         unmatched = []
+        buckets = {
+            'matched': matched.append,
+            'insufficient': insufficient.append,
+            'unmatched': unmatched.append
+        }
+        matched_total_received = 0
+        matched_installment = 0
+        matched_remaining = 0
         
-        for match in all_matches:
+        for client_id, match_status, total_received, installment_amount, remaining_amount in all_matches:
+            append = buckets.get(match_status)
+            if append is None:
+                continue
+            
             match_data = {
-                'client_id': match.client_id,
-                'total_received': round(match.total_received or 0, 2),
-                'installment_amount': round(match.installment_amount, 2),
-                'remaining_amount': round(match.remaining_amount or 0, 2)
+                'client_id': client_id,
+                'total_received': round(total_received or 0, 2),
+                'installment_amount': round(installment_amount, 2),
+                'remaining_amount': round(remaining_amount or 0, 2)
             }
+            append(match_data)
             
-            if match.match_status == 'matched':
-                matched.append(match_data)
-            elif match.match_status == 'insufficient':
-                insufficient.append(match_data)
-            elif match.match_status == 'unmatched':
-                unmatched.append(match_data)
+            if match_status == 'matched':
+                matched_total_received += match_data['total_received']
+                matched_installment += match_data['installment_amount']
+                matched_remaining += match_data['remaining_amount']
         
         return jsonify({
             'success': True,
@@ -325,9 +441,9 @@ def get_match_results(job_id, subsidiary_id):
             'unmatched': unmatched,
             'totals': {
                 'matched_count': len(matched),
-                'matched_total_received': sum(m['total_received'] for m in matched),
-                'matched_installment': sum(m['installment_amount'] for m in matched),
-                'matched_remaining': sum(m['remaining_amount'] for m in matched),
+                'matched_total_received': matched_total_received,
+                'matched_installment': matched_installment,
+                'matched_remaining': matched_remaining,
                 'insufficient_count': len(insufficient),
                 'unmatched_count': len(unmatched)
             }
@@ -344,39 +460,44 @@ def download_match_results(job_id, subsidiary_id, match_type):
         if not dataset:
             return jsonify({'success': False, 'error': 'No dataset found'}), 404
         
-        # Get matches of specified type
-        if match_type == 'all':
-            matches = FPMatchResult.query.filter_by(dataset_id=dataset.id).all()
-        else:
-            matches = FPMatchResult.query.filter_by(dataset_id=dataset.id, match_status=match_type).all()
+        # Get matches of specified type (plain tuples in CSV column order, no ORM objects)
+        matches = FPMatchResult.query.with_entities(
+            FPMatchResult.client_id,
+            FPMatchResult.total_received,
+            FPMatchResult.installment_amount,
+            FPMatchResult.remaining_amount,
+            FPMatchResult.match_status
+        ).filter_by(dataset_id=dataset.id)
+        if match_type != 'all':
+            matches = matches.filter_by(match_status=match_type)
+        matches = matches.order_by(FPMatchResult.id).all()
         
         if not matches:
             return jsonify({'success': False, 'error': f'No {match_type} results found'}), 404
         
-        # Create CSV file
-        output_dir = f"generated_journals/job_{job_id}_sub_{subsidiary_id}"
-        os.makedirs(output_dir, exist_ok=True)
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"match_results_{match_type}_{timestamp}.csv"
-        filepath = os.path.join(output_dir, filename)
         
-        # Write CSV
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['Client ID', 'Total Received', 'Installment Amount', 'Remaining Amount', 'Status']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for match in matches:
-                writer.writerow({
-                    'Client ID': match.client_id,
-                    'Total Received': round(match.total_received or 0, 2),
-                    'Installment Amount': round(match.installment_amount, 2),
-                    'Remaining Amount': round(match.remaining_amount or 0, 2),
-                    'Status': match.match_status
-                })
-        
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        # Write CSV in memory (nothing touches the disk)
+        csvfile = io.StringIO(newline='')
+        writer = csv.writer(csvfile)
+        writer.writerow(['Client ID', 'Total Received', 'Installment Amount', 'Remaining Amount', 'Status'])
+        writer.writerows(
+            (client_id, round(total_received or 0, 2), round(installment_amount, 2), round(remaining_amount or 0, 2), match_status)
+            for client_id, total_received, installment_amount, remaining_amount, match_status in matches
+        )
+        body = csvfile.getvalue().encode('utf-8')
+        
+        # Compress the body when the client accepts gzip
+        use_gzip = request.accept_encodings['gzip'] > 0
+        if use_gzip:
+            body = gzip.compress(body)
+        
+        response = send_file(io.BytesIO(body), mimetype='text/csv', as_attachment=True, download_name=filename)
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -390,7 +511,7 @@ def clear_matches(job_id, subsidiary_id):
             return jsonify({'success': True, 'message': 'No data to clear'})
         
         # Delete all match results
-        FPMatchResult.query.filter_by(dataset_id=dataset.id).delete()
+        FPMatchResult.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Match results cleared successfully'})
@@ -412,20 +533,10 @@ def generate_journals(job_id, subsidiary_id):
             return jsonify({'success': False, 'error': 'No dataset found'}), 400
         
         # Check if matching was done
-        match_results = FPMatchResult.query.filter_by(dataset_id=dataset.id, match_status='matched').all()
+        match_results = FPMatchResult.query.filter_by(dataset_id=dataset.id, match_status='matched').order_by(FPMatchResult.id).all()
         if not match_results:
             return jsonify({'success': False, 'error': 'No matched results found. Run matching first.'}), 400
         
-        # Get original journal rows
-        original_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
-        
-        # Calculate original totals by journal type
-        original_totals = {}
-        for row in original_rows:
-            if row.journal_type not in original_totals:
-                original_totals[row.journal_type] = 0
-            original_totals[row.journal_type] += (row.amount or 0)
-        
         # Create lookup of matched clients with their remaining amounts
         matched_clients = {}
         for match in match_results:
@@ -450,14 +561,37 @@ def generate_journals(job_id, subsidiary_id):
             'Salon_Summit_Installments': 0
         }
         
-        # Process each original journal row
+        # Stream original journal rows (only the columns used) in a single pass that
+        # totals them by journal type, keeps the first row per client as the Summit
+        # template and builds the adjusted journals
+        original_rows = FPJournalRow.query.with_entities(
+            FPJournalRow.journal_type,
+            FPJournalRow.client_id,
+            FPJournalRow.amount,
+            FPJournalRow.row_json
+        ).filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).yield_per(STREAM_BATCH_SIZE)
+        
+        original_totals = {}
+        template_by_client = {}
+        
         for row in original_rows:
-            client_id = str(row.client_id).strip() if row.client_id else ''
-            row_data = json.loads(row.row_json) if row.row_json else {}
+            # Calculate original totals by journal type
+            if row.journal_type not in original_totals:
+                original_totals[row.journal_type] = 0
+            original_totals[row.journal_type] += (row.amount or 0)
+            
+            # Process each original journal row (client id trimmed once per row)
+            client_id = row.client_id.strip() if row.client_id else ''
+            row_data = orjson.loads(row.row_json) if row.row_json else {}
             
             if client_id in matched_clients:
+                # First original row per matched client, kept parsed as the Summit row template
+                # (a copy, since row_data gets its amount replaced below)
+                if client_id not in template_by_client:
+                    template_by_client[client_id] = dict(row_data)
+                
                 match_info = matched_clients[client_id]
-                original_amount = row.amount or 0
+                original_amount = row.amount
                 
                 # Calculate proportion of this row's amount
                 if match_info['total_received'] > 0:
@@ -479,14 +613,8 @@ def generate_journals(job_id, subsidiary_id):
         # Generate Summit journal from matched clients
         for match in match_results:
             # Find any original row for this client to use as template
-            template_row = None
-            for row in original_rows:
-                if str(row.client_id).strip() == match.client_id:
-                    template_row = row
-                    break
-            
-            if template_row:
-                row_data = json.loads(template_row.row_json) if template_row.row_json else {}
+            if match.client_id in template_by_client:
+                row_data = dict(template_by_client[match.client_id])
                 
                 # Modify for summit journal
                 row_data['amount'] = match.installment_amount
@@ -501,9 +629,9 @@ def generate_journals(job_id, subsidiary_id):
                 generated_journals['Salon_Summit_Installments'].append(row_data)
                 new_totals['Salon_Summit_Installments'] += match.installment_amount
         
-        # Clear any existing processed journals
-        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete()
-        db.session.commit()
+        # Clear any existing processed journals (same transaction as the new rows,
+        # so a failed generation leaves the previous journals in place)
+        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         
         # Save journals to database AND as CSV files
         output_dir = f"generated_journals/job_{job_id}_sub_{subsidiary_id}"
@@ -512,46 +640,52 @@ def generate_journals(job_id, subsidiary_id):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         generated_files = []
         
-        for journal_type, rows in generated_journals.items():
-            if not rows:
-                continue
-            
-            # Save to database
-            for row_data in rows:
-                processed_journal = FPProcessedJournal(
-                    dataset_id=dataset.id,
-                    job_id=job_id,
-                    subsidiary_id=subsidiary_id,
-                    journal_type=journal_type,
-                    client_id=row_data.get('client_number', ''),
-                    invoice_number=row_data.get('invoice_number', ''),
-                    amount=row_data.get('amount', 0),
-                    row_json=json.dumps(row_data)
-                )
-                db.session.add(processed_journal)
-            
-            # Save to CSV file
-            filename = f"{journal_type}_{subsidiary_id}_{timestamp}.csv"
-            filepath = os.path.join(output_dir, filename)
-            
-            # Get headers from first row
-            if rows:
-                headers = list(rows[0].keys())
-                
-                with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=headers)
-                    writer.writeheader()
-                    writer.writerows(rows)
+        processed_journals = []
+        csv_writes = []
+        
+        # CSV files are independent of each other and of the session, so they are written on
+        # worker threads while the database rows are built here (the session stays on this thread)
+        with ThreadPoolExecutor(max_workers=len(generated_journals)) as csv_executor:
+            for journal_type, rows in generated_journals.items():
+                if not rows:
+                    continue
                 
-                generated_files.append({
+                # Save to database (plain mappings, inserted in bulk below)
+                processed_journals.extend({
+                    'dataset_id': dataset.id,
+                    'job_id': job_id,
+                    'subsidiary_id': subsidiary_id,
                     'journal_type': journal_type,
-                    'filename': filename,
-                    'filepath': filepath,
-                    'row_count': len(rows),
-                    'total_amount': round(new_totals[journal_type], 2)
-                })
+                    'client_id': row_data.get('client_number', ''),
+                    'invoice_number': row_data.get('invoice_number', ''),
+                    'amount': row_data.get('amount', 0),
+                    'row_json': orjson.dumps(row_data).decode('utf-8')
+                } for row_data in rows)
+                
+                # Save to CSV file
+                filename = f"{journal_type}_{subsidiary_id}_{timestamp}.csv"
+                filepath = os.path.join(output_dir, filename)
+                
+                # Get headers from first row
+                if rows:
+                    headers = list(rows[0].keys())
+                    csv_writes.append(csv_executor.submit(_write_csv, filepath, headers, rows))
+                    
+                    generated_files.append({
+                        'journal_type': journal_type,
+                        'filename': filename,
+                        'filepath': filepath,
+                        'row_count': len(rows),
+                        'total_amount': round(new_totals[journal_type], 2)
+                    })
+        
+        # Re-raise any CSV write error before anything is committed
+        for csv_write in csv_writes:
+            csv_write.result()
         
         # Commit database changes
+        for start in range(0, len(processed_journals), INSERT_BATCH_SIZE):
+            db.session.execute(_PROCESSED_INSERT, processed_journals[start:start + INSERT_BATCH_SIZE])
         db.session.commit()
         
         # Calculate reconciliation
@@ -574,6 +708,7 @@ def generate_journals(job_id, subsidiary_id):
         })
     
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @journals_bp.route('/api/process/<int:job_id>/<int:subsidiary_id>', methods=['POST'])
@@ -595,11 +730,10 @@ def process_summit(job_id, subsidiary_id):
         print(f"DEBUG: Found dataset {dataset.id}")
         
         # Check if at least one journal uploaded
-        journal_count = FPJournalRow.query.filter_by(dataset_id=dataset.id).count()
-        if journal_count == 0:
+        if not _has_rows(FPJournalRow.query.filter_by(dataset_id=dataset.id)):
             return jsonify({'success': False, 'error': 'Please upload at least one journal file first'}), 400
         
-        print(f"DEBUG: Found {journal_count} journal rows")
+        print("DEBUG: Found journal rows")
         
         # Check if summit data matched
         match_results = FPMatchResult.query.filter_by(dataset_id=dataset.id).all()
@@ -608,63 +742,67 @@ def process_summit(job_id, subsidiary_id):
         
         print(f"DEBUG: Found {len(match_results)} match results")
         
-        # Get summit installments
-        summit_installments = FPSummitInstallment.query.filter_by(dataset_id=dataset.id).all()
-        if not summit_installments:
+        # Get summit installments (combined per client)
+        summit_by_client = _summit_totals_by_client(dataset.id)
+        if not summit_by_client:
             return jsonify({'success': False, 'error': 'No summit data uploaded'}), 400
         
-        print(f"DEBUG: Found {len(summit_installments)} summit installments")
+        print(f"DEBUG: Found {len(summit_by_client)} summit clients")
         
         # Check if already processed
-        existing_processed = FPProcessedJournal.query.filter_by(dataset_id=dataset.id).first()
-        if existing_processed:
+        if _has_rows(FPProcessedJournal.query.filter_by(dataset_id=dataset.id)):
             return jsonify({
                 'success': False, 
                 'error': 'Summit processing already complete. Clear to reprocess.'
             }), 409
         
-        # STEP 1: Copy FPJournalRow → FPProcessedJournal
-        original_journal_rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
-        if not original_journal_rows:
-            return jsonify({'success': False, 'error': 'No original journal data found'}), 400
-        
-        for orig_row in original_journal_rows:
-            processed_row = FPProcessedJournal(
-                dataset_id=dataset.id,
-                job_id=job_id,
-                subsidiary_id=subsidiary_id,
-                journal_type=orig_row.journal_type,
-                client_id=orig_row.client_id,
-                invoice_number=orig_row.invoice_number,
-                amount=orig_row.amount,
-                row_json=orig_row.row_json
-            )
-            db.session.add(processed_row)
-        
-        db.session.flush()
-        
-        # STEP 2: Build lookup for processed journal by client_id
-        processed_rows = FPProcessedJournal.query.filter_by(dataset_id=dataset.id).all()
+        # STEP 1: Copy FPJournalRow → FPProcessedJournal in the database (INSERT ... SELECT)
+        # (the journal row check above already guarantees there are rows to copy)
+        db.session.execute(_PROCESSED_INSERT.from_select(
+            ['dataset_id', 'job_id', 'subsidiary_id', 'journal_type', 'client_id', 'invoice_number', 'amount', 'row_json'],
+            db.select(
+                FPJournalRow.dataset_id,
+                db.literal(job_id),
+                db.literal(subsidiary_id),
+                FPJournalRow.journal_type,
+                FPJournalRow.client_id,
+                FPJournalRow.invoice_number,
+                FPJournalRow.amount,
+                FPJournalRow.row_json
+            ).where(FPJournalRow.dataset_id == dataset.id).order_by(FPJournalRow.id)
+        ))
+        
+        # STEP 2: Build lookup for processed journal by client_id (plain column tuples,
+        # only for clients that have a summit installment)
+        processed_rows = db.session.query(
+            FPProcessedJournal.id,
+            FPProcessedJournal.client_id,
+            FPProcessedJournal.invoice_number,
+            FPProcessedJournal.amount,
+            FPProcessedJournal.row_json
+        ).filter(FPProcessedJournal.dataset_id == dataset.id).order_by(FPProcessedJournal.id)
         processed_lookup = {}
-        for row in processed_rows:
-            client_id = str(row.client_id).strip() if row.client_id else ''
-            if client_id:
+        for row_id, row_client_id, invoice_number, amount, row_json in processed_rows:
+            client_id = row_client_id.strip() if row_client_id else ''
+            if client_id and client_id in summit_by_client:
                 if client_id not in processed_lookup:
                     processed_lookup[client_id] = []
-                processed_lookup[client_id].append(row)
-        
-        # STEP 3: Combine duplicate summit clients
-        summit_by_client = {}
-        for installment in summit_installments:
-            client_id = installment.client_id.strip()
-            if client_id not in summit_by_client:
-                summit_by_client[client_id] = 0
-            summit_by_client[client_id] += installment.installment_amount
+                processed_lookup[client_id].append({
+                    'id': row_id,
+                    'client_id': client_id,
+                    'invoice_number': invoice_number,
+                    'amount': amount,
+                    'row_json': row_json
+                })
         
-        # STEP 4: Process each summit client
+        # STEP 3: Process each summit client
         matched_count = 0
         total_summit_amount = 0.0
         unmatched_clients = []
+        summit_rows = []
+        matched_rows = []
+        matched_totals = []
+        matched_installments = []
         
         for client_id, installment_amount in summit_by_client.items():
             if installment_amount <= 0:
@@ -680,7 +818,7 @@ def process_summit(job_id, subsidiary_id):
                 continue
             
             client_rows = processed_lookup[client_id]
-            total_client_amount = sum(row.amount or 0 for row in client_rows)
+            total_client_amount = sum(row['amount'] for row in client_rows)
             
             # Check if client has sufficient amount
             if total_client_amount < installment_amount:
@@ -699,79 +837,99 @@ def process_summit(job_id, subsidiary_id):
                 })
                 continue
             
-            # MATCH! Reduce amounts proportionally
-            for row in client_rows:
-                current_amount = row.amount or 0
-                reduction = (current_amount / total_client_amount) * installment_amount
-                row.amount = current_amount - reduction
-                
-                # Update row_json
-                if row.row_json:
-                    try:
-                        row_data = json.loads(row.row_json)
-                        row_data['amount'] = row.amount
-                        row.row_json = json.dumps(row_data)
-                    except Exception as e:
-                        print(f"WARNING: Failed to update row_json for client {client_id}: {e}")
-                        pass
+            # MATCH! Queue the client's rows for the proportional reduction below
+            matched_rows.extend(client_rows)
+            matched_totals.extend([total_client_amount] * len(client_rows))
+            matched_installments.extend([installment_amount] * len(client_rows))
             
-            # Create summit installment row
+            # Create summit installment row (the reduction only changes 'amount', which is
+            # overwritten here, so the row's JSON can be read before it is reduced)
             first_row = client_rows[0]
             summit_row_data = {}
-            if first_row.row_json:
+            if first_row['row_json']:
                 try:
-                    summit_row_data = json.loads(first_row.row_json)
+                    # Keep the parse so the reduction below does not parse this row again
+                    first_row['row_data'] = orjson.loads(first_row['row_json'])
+                    summit_row_data = dict(first_row['row_data'])
                 except Exception as e:
                     print(f"WARNING: Failed to parse summit row_json: {e}")
                     pass
             
-            summit_row = FPProcessedJournal(
-                dataset_id=dataset.id,
-                job_id=job_id,
-                subsidiary_id=subsidiary_id,
-                journal_type='Salon_Summit_Installments',
-                client_id=client_id,
-                invoice_number=first_row.invoice_number,
-                amount=installment_amount,
-                row_json=json.dumps({
-                    **summit_row_data,
-                    'amount': installment_amount,
-                    'journal_type': 'Salon_Summit_Installments'
-                })
-            )
-            db.session.add(summit_row)
+            summit_row_data['amount'] = installment_amount
+            summit_row_data['journal_type'] = 'Salon_Summit_Installments'
+            
+            summit_rows.append({
+                'dataset_id': dataset.id,
+                'job_id': job_id,
+                'subsidiary_id': subsidiary_id,
+                'journal_type': 'Salon_Summit_Installments',
+                'client_id': client_id,
+                'invoice_number': first_row['invoice_number'],
+                'amount': installment_amount,
+                'row_json': orjson.dumps(summit_row_data).decode('utf-8')
+            })
             
             matched_count += 1
             total_summit_amount += installment_amount
         
+        # STEP 4: Reduce all matched rows' amounts proportionally in one vectorized pass
+        current_amounts = np.fromiter((row['amount'] for row in matched_rows), dtype=np.float64, count=len(matched_rows))
+        reduced_amounts = current_amounts - (current_amounts / np.array(matched_totals, dtype=np.float64)) * np.array(matched_installments, dtype=np.float64)
+        
+        reduced_rows = []
+        for row, reduced_amount in zip(matched_rows, reduced_amounts.tolist()):
+            row['amount'] = reduced_amount
+            
+            # Update row_json
+            if row['row_json']:
+                try:
+                    row_data = row.pop('row_data', None)
+                    if row_data is None:
+                        row_data = orjson.loads(row['row_json'])
+                    row_data['amount'] = row['amount']
+                    row['row_json'] = orjson.dumps(row_data).decode('utf-8')
+                except Exception as e:
+                    print(f"WARNING: Failed to update row_json for client {row['client_id']}: {e}")
+                    pass
+            
+            reduced_rows.append({'id': row['id'], 'amount': row['amount'], 'row_json': row['row_json']})
+        
+        # Reduced amounts go back as an UPDATE by primary key and summit rows as batched
+        # Core executemany, all committed together as one transaction
+        for start in range(0, len(reduced_rows), INSERT_BATCH_SIZE):
+            db.session.execute(db.update(FPProcessedJournal), reduced_rows[start:start + INSERT_BATCH_SIZE])
+        
+        for start in range(0, len(summit_rows), INSERT_BATCH_SIZE):
+            db.session.execute(_PROCESSED_INSERT, summit_rows[start:start + INSERT_BATCH_SIZE])
+        
         db.session.commit()
         
         print("DEBUG: Committed to database successfully")
         
         # Simple response without complex reconciliation (to avoid errors)
-        processed_rows_all = FPProcessedJournal.query.filter_by(dataset_id=dataset.id).all()
-        
-        # Group by journal type
-        journal_groups = {}
-        for row in processed_rows_all:
-            jtype = row.journal_type
-            if jtype not in journal_groups:
-                journal_groups[jtype] = []
-            journal_groups[jtype].append(row)
+        # Group by journal type in the database, in order of first appearance
+        journal_groups = db.session.query(
+            FPProcessedJournal.journal_type,
+            db.func.count(FPProcessedJournal.id),
+            db.func.sum(FPProcessedJournal.amount)
+        ).filter(
+            FPProcessedJournal.dataset_id == dataset.id
+        ).group_by(FPProcessedJournal.journal_type).order_by(db.func.min(FPProcessedJournal.id)).all()
         
         # Build simple file list
         generated_files = []
-        for jtype, rows in journal_groups.items():
-            total = sum(r.amount or 0 for r in rows)
+        processed_total = 0
+        for jtype, row_count, total in journal_groups:
+            total = total or 0
+            processed_total += total
             generated_files.append({
                 'journal_type': jtype,
-                'row_count': len(rows),
+                'row_count': row_count,
                 'total_amount': round(total, 2)
             })
         
         # Simple reconciliation
-        original_total = sum(row.amount or 0 for row in original_journal_rows)
-        processed_total = sum(row.amount or 0 for row in processed_rows_all)
+        original_total = db.session.query(db.func.sum(FPJournalRow.amount)).filter_by(dataset_id=dataset.id).scalar() or 0
         
         return jsonify({
             'success': True,
@@ -809,10 +967,10 @@ def clear_processing(job_id, subsidiary_id):
             return jsonify({'success': False, 'error': 'No dataset found'}), 400
         
         # Delete processed journals
-        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete()
+        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         
         # Delete summit installments
-        FPSummitInstallment.query.filter_by(dataset_id=dataset.id).delete()
+        FPSummitInstallment.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         
         db.session.commit()
         
@@ -830,58 +988,80 @@ def download_journal(job_id, subsidiary_id, journal_type):
         if not dataset:
             return jsonify({'success': False, 'error': 'No dataset found'}), 404
         
-        # Get rows for this journal type
-        rows = FPProcessedJournal.query.filter_by(
+        # Get rows for this journal type (plain tuples, streamed below)
+        rows = FPProcessedJournal.query.with_entities(
+            FPProcessedJournal.client_id,
+            FPProcessedJournal.invoice_number,
+            FPProcessedJournal.amount,
+            FPProcessedJournal.journal_type,
+            FPProcessedJournal.row_json
+        ).filter_by(
             dataset_id=dataset.id,
             journal_type=journal_type
-        ).all()
+        ).order_by(FPProcessedJournal.id)
         
-        if not rows:
+        first_row = rows.first()
+        if first_row is None:
             # Check if generation was done at all
-            any_generated = FPProcessedJournal.query.filter_by(dataset_id=dataset.id).first()
-            if not any_generated:
+            if not _has_rows(FPProcessedJournal.query.filter_by(dataset_id=dataset.id)):
                 return jsonify({'success': False, 'error': f'No journals generated yet. Click "Generate Journals" button first.'}), 404
             else:
                 return jsonify({'success': False, 'error': f'No rows found for {journal_type}. This journal type may be empty.'}), 404
         
-        # Create CSV file
-        output_dir = f"generated_journals/job_{job_id}_sub_{subsidiary_id}"
-        os.makedirs(output_dir, exist_ok=True)
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{journal_type}_{subsidiary_id}_{timestamp}.csv"
-        filepath = os.path.join(output_dir, filename)
         
         # Get headers from first row
-        if rows[0].row_json:
+        if first_row.row_json:
             try:
-                sample_data = json.loads(rows[0].row_json)
+                sample_data = orjson.loads(first_row.row_json)
                 headers = list(sample_data.keys())
             except:
                 headers = ['client_id', 'invoice_number', 'amount', 'journal_type']
         else:
             headers = ['client_id', 'invoice_number', 'amount', 'journal_type']
         
-        # Write CSV
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
+        def generate_csv():
+            # Stream the CSV straight into the response, one batch of rows per chunk
+            csvfile = io.StringIO(newline='')
+            writer = csv.writer(csvfile)
+            writer.writerow(headers)
+            header_set = set(headers)
             
-            for row in rows:
+            for index, row in enumerate(rows.yield_per(STREAM_BATCH_SIZE), 1):
                 if row.row_json:
                     try:
-                        row_data = json.loads(row.row_json)
+                        row_data = orjson.loads(row.row_json)
                         row_data['amount'] = row.amount  # Ensure updated amount
-                        writer.writerow(row_data)
+                        writer.writerow(_csv_row(row_data, headers, header_set))
                     except:
-                        writer.writerow({
+                        writer.writerow(_csv_row({
                             'client_id': row.client_id,
                             'invoice_number': row.invoice_number,
                             'amount': row.amount,
                             'journal_type': row.journal_type
-                        })
-        
-        return send_file(filepath, as_attachment=True, download_name=filename)
+                        }, headers, header_set))
+                
+                if index % STREAM_BATCH_SIZE == 0:
+                    yield csvfile.getvalue()
+                    csvfile.seek(0)
+                    csvfile.truncate()
+            
+            yield csvfile.getvalue()
+        
+        # Compress the stream when the client accepts gzip
+        use_gzip = request.accept_encodings['gzip'] > 0
+        body = _gzip_chunks(generate_csv()) if use_gzip else generate_csv()
+        
+        response = Response(
+            stream_with_context(body),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -925,66 +1105,57 @@ def upload_journals(job_id, subsidiary_id):
             db.session.add(dataset)
             db.session.flush()
         
-        payload = request.get_json(force=True)
+        # Parse the raw body directly (not cached on the request, so large uploads are not held twice)
+        payload = orjson.loads(request.get_data(cache=False))
         journal_type = payload.get('journal_type')  # 'Main' | 'POA' | 'Cross_Subsidiary' | EU variants
         filename = payload.get('filename', 'uploaded.csv')
         rows = payload.get('rows', [])
         
-        # Valid journal types (includes EU-specific types)
-        valid_types = [
-            'Main', 'POA', 'Cross_Subsidiary',  # Non-EU
-            'Main_EU', 'POA_EU', 'Cross_Subsidiary_EU', 'Refunds_EU',  # EU EUR
-            'Main_AED', 'POA_AED', 'Cross_Subsidiary_AED', 'Refunds_AED'  # EU AED
-        ]
-        
-        if journal_type not in valid_types:
+        if journal_type not in VALID_JOURNAL_TYPES:
             return jsonify({'success': False, 'error': f'Invalid journal_type: {journal_type}'}), 400
         
         # Check if this journal type already uploaded
-        existing = FPJournalRow.query.filter_by(
+        if _has_rows(FPJournalRow.query.filter_by(
             dataset_id=dataset.id,
             journal_type=journal_type
-        ).first()
-        
-        if existing:
+        )):
             return jsonify({
                 'success': False, 
                 'error': f'{journal_type} journal already uploaded. Clear to re-upload.'
             }), 409
         
-        # Store rows
-        created = 0
+        # Store rows (plain mappings, inserted in bulk)
+        journal_rows = []
+        uploaded_at = datetime.utcnow()
         for row in rows:
             amount = float(row.get('amount', 0) or 0)
             client_id = str(row.get('client_id') or row.get('Client') or '')
             invoice_number = str(row.get('invoice_number') or row.get('Invoice') or '')
             
-            journal_row = FPJournalRow(
-                dataset_id=dataset.id,
-                job_id=job_id,
-                subsidiary_id=subsidiary_id,
-                journal_type=journal_type,
-                client_id=client_id,
-                invoice_number=invoice_number,
-                amount=amount,
-                row_json=json.dumps(row),
-                filename=filename
-            )
-            db.session.add(journal_row)
-            created += 1
-        
-        # Update dataset status to committed once all 3 journals are uploaded
-        uploaded_types = db.session.query(FPJournalRow.journal_type).filter_by(
-            dataset_id=dataset.id
-        ).distinct().all()
-        uploaded_type_names = [t[0] for t in uploaded_types]
-        
-        if journal_type not in uploaded_type_names:
-            uploaded_type_names.append(journal_type)
-        
-        # Mark as committed if ANY journals are uploaded (flexible approach)
-        if len(uploaded_type_names) > 0:
-            dataset.status = 'committed'
+            journal_rows.append({
+                'dataset_id': dataset.id,
+                'job_id': job_id,
+                'subsidiary_id': subsidiary_id,
+                'journal_type': journal_type,
+                'client_id': client_id,
+                'invoice_number': invoice_number,
+                'amount': amount,
+                'row_json': orjson.dumps(row).decode('utf-8'),
+                'filename': filename,
+                'uploaded_at': uploaded_at
+            })
+        
+        # psycopg 3 loads the rows with COPY; other drivers use batched executemany
+        if journal_rows and db.session.get_bind().dialect.driver == 'psycopg':
+            _copy_rows(FPJournalRow.__table__, journal_rows)
+        else:
+            for start in range(0, len(journal_rows), INSERT_BATCH_SIZE):
+                db.session.execute(_JOURNAL_ROW_INSERT, journal_rows[start:start + INSERT_BATCH_SIZE])
+        created = len(journal_rows)
+        
+        # Mark as committed if ANY journals are uploaded (flexible approach) - this
+        # upload just added one, so no need to look up the other uploaded types
+        dataset.status = 'committed'
         
         db.session.commit()
         
@@ -1006,11 +1177,7 @@ def journals_upload_status(job_id, subsidiary_id):
         dataset = FPDataset.query.filter_by(job_id=job_id, subsidiary_id=subsidiary_id).first()
         
         # Determine expected journal types based on subsidiary
-        if subsidiary_id == 4:  # EU
-            journal_types = ['Main_EU', 'POA_EU', 'Cross_Subsidiary_EU', 'Refunds_EU', 
-                           'Main_AED', 'POA_AED', 'Cross_Subsidiary_AED', 'Refunds_AED']
-        else:  # Non-EU
-            journal_types = ['Main', 'POA', 'Cross_Subsidiary']
+        journal_types = EU_JOURNAL_TYPES if subsidiary_id == 4 else NON_EU_JOURNAL_TYPES
         
         if not dataset:
             return jsonify({
@@ -1021,21 +1188,23 @@ def journals_upload_status(job_id, subsidiary_id):
                 'all_uploaded': False
             })
         
-        # Get counts and totals for each journal type
+        # Get counts and totals for each journal type in one grouped query
+        type_stats = {
+            jtype: (count, total)
+            for jtype, count, total in db.session.query(
+                FPJournalRow.journal_type,
+                db.func.count(FPJournalRow.id),
+                db.func.sum(FPJournalRow.amount)
+            ).filter_by(dataset_id=dataset.id).group_by(FPJournalRow.journal_type)
+        }
+        
         uploaded = {}
         counts = {}
         totals = {}
         
         for jtype in journal_types:
-            count = FPJournalRow.query.filter_by(
-                dataset_id=dataset.id,
-                journal_type=jtype
-            ).count()
-            
-            total = db.session.query(db.func.sum(FPJournalRow.amount)).filter_by(
-                dataset_id=dataset.id,
-                journal_type=jtype
-            ).scalar() or 0
+            count, total = type_stats.get(jtype, (0, None))
+            total = total or 0
             
             uploaded[jtype] = count > 0
             counts[jtype] = count
@@ -1077,31 +1246,37 @@ def get_combined_data(job_id, subsidiary_id):
                 'totals': {'count': 0, 'amount': 0.0}
             })
         
-        # Get all journal rows
-        rows = FPJournalRow.query.filter_by(dataset_id=dataset.id).all()
+        # Get all journal rows (plain tuples, streamed in batches)
+        rows = FPJournalRow.query.with_entities(
+            FPJournalRow.journal_type,
+            FPJournalRow.amount,
+            FPJournalRow.client_id,
+            FPJournalRow.invoice_number,
+            FPJournalRow.row_json
+        ).filter_by(dataset_id=dataset.id).order_by(FPJournalRow.id).yield_per(STREAM_BATCH_SIZE)
         
         # Parse and combine data
         data_rows = []
         total_amount = 0.0
         
-        for row in rows:
+        for journal_type, amount, client_id, invoice_number, row_json in rows:
             try:
-                row_data = json.loads(row.row_json) if row.row_json else {}
-                row_data['_journal_type'] = row.journal_type
-                row_data['_amount'] = row.amount
-                row_data['_client_id'] = row.client_id
-                row_data['_invoice_number'] = row.invoice_number
+                row_data = orjson.loads(row_json) if row_json else {}
+                row_data['_journal_type'] = journal_type
+                row_data['_amount'] = amount
+                row_data['_client_id'] = client_id
+                row_data['_invoice_number'] = invoice_number
                 data_rows.append(row_data)
-                total_amount += (row.amount or 0)
+                total_amount += amount
             except:
                 # Fallback for rows without JSON
                 data_rows.append({
-                    '_journal_type': row.journal_type,
-                    '_client_id': row.client_id,
-                    '_invoice_number': row.invoice_number,
-                    '_amount': row.amount
+                    '_journal_type': journal_type,
+                    '_client_id': client_id,
+                    '_invoice_number': invoice_number,
+                    '_amount': amount
                 })
-                total_amount += (row.amount or 0)
+                total_amount += amount
         
         return jsonify({
             'success': True,
@@ -1124,11 +1299,11 @@ def clear_journals(job_id, subsidiary_id):
             return jsonify({'success': True, 'message': 'No data to clear'})
         
         # Delete all journal rows
-        FPJournalRow.query.filter_by(dataset_id=dataset.id).delete()
+        FPJournalRow.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         
         # Also clear any processed data and summit data
-        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete()
-        FPSummitInstallment.query.filter_by(dataset_id=dataset.id).delete()
+        FPProcessedJournal.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
+        FPSummitInstallment.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
         
         # Reset dataset status
         dataset.status = 'empty'
@@ -8,12 +8,12 @@ import sys
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
-# Database connection parameters
-DB_HOST = 'localhost'
-DB_PORT = '5432'
-DB_NAME = 'permanent_receipts'
-DB_USER = 'postgres'
-DB_PASSWORD = 'password'
+# Database connection parameters (overridable from the environment)
+DB_HOST = os.environ.get('DB_HOST', 'localhost')
+DB_PORT = os.environ.get('DB_PORT', '5432')
+DB_NAME = os.environ.get('DB_NAME', 'permanent_receipts')
+DB_USER = os.environ.get('DB_USER', 'postgres')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', 'password')
 
 def run_migration():
     """Add original_amounts column to fp_datasets table"""
@@ -29,24 +29,13 @@ def run_migration():
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         cursor = conn.cursor()
         
-        # Check if column already exists
-        cursor.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='fp_datasets' AND column_name='original_amounts'
-        """)
-        
-        if cursor.fetchone():
-            print("Column 'original_amounts' already exists in fp_datasets table")
-            return True
-        
-        # Add the column
+        # Add the column if it is missing (one round trip, no-op when it already exists)
         cursor.execute("""
             ALTER TABLE fp_datasets 
-            ADD COLUMN original_amounts TEXT
+            ADD COLUMN IF NOT EXISTS original_amounts TEXT
         """)
         
-        print("Successfully added 'original_amounts' column to fp_datasets table")
+        print("Ensured 'original_amounts' column exists in fp_datasets table")
         return True
         
     except Exception as e:
@@ -0,0 +1,48 @@
+"""Default further processing journal amounts to zero
+
+Revision ID: f1c6a3e9d274
+Revises: e4b8d2a6c153
+Create Date: 2026-10-16 15:41:27.215906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a3e9d274'
+down_revision = 'e4b8d2a6c153'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfill any missing amounts before the columns become NOT NULL
+    op.execute('UPDATE fp_journal_rows SET amount = 0 WHERE amount IS NULL')
+    op.execute('UPDATE fp_processed_journals SET amount = 0 WHERE amount IS NULL')
+
+    with op.batch_alter_table('fp_journal_rows', schema=None) as batch_op:
+        batch_op.alter_column('amount',
+               existing_type=sa.Float(),
+               server_default='0',
+               nullable=False)
+
+    with op.batch_alter_table('fp_processed_journals', schema=None) as batch_op:
+        batch_op.alter_column('amount',
+               existing_type=sa.Float(),
+               server_default='0',
+               nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('fp_processed_journals', schema=None) as batch_op:
+        batch_op.alter_column('amount',
+               existing_type=sa.Float(),
+               server_default=None,
+               nullable=True)
+
+    with op.batch_alter_table('fp_journal_rows', schema=None) as batch_op:
+        batch_op.alter_column('amount',
+               existing_type=sa.Float(),
+               server_default=None,
+               nullable=True)
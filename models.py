@@ -1,5 +1,73 @@
+import sqlite3
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, Numeric, Index, inspect, event, select
+from sqlalchemy.engine import Engine
+
+# Rows per executemany in bulk_insert
+BULK_INSERT_BATCH_SIZE = 1000
+
+def bulk_insert(db, model, rows, batch_size=BULK_INSERT_BATCH_SIZE):
+    """
+    Insert plain dict rows into a model's table with Core executemany, batch_size rows at a time.
+    Skips the ORM unit of work; rows join the session's transaction and are committed by the caller.
+    """
+    insert_stmt = model.__table__.insert()
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert_stmt, rows[start:start + batch_size])
+
+def column_serializer(model, keys=None):
+    """
+    Build a to_dict method for model covering keys (default: every mapped column, in declaration order).
+    DateTime values are rendered with isoformat(). Loaded values are read straight from the instance
+    __dict__ to skip the ORM descriptor on every attribute; expired or unloaded ones fall back to getattr.
+    """
+    attrs = inspect(model).column_attrs
+    if keys is None:
+        keys = [attr.key for attr in attrs]
+    datetime_keys = {attr.key for attr in attrs if isinstance(attr.columns[0].type, DateTime)}
+    columns = tuple((key, key in datetime_keys) for key in keys)
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        values = self.__dict__
+        result = {}
+        for key, is_datetime in columns:
+            value = values[key] if key in values else getattr(self, key)
+            if is_datetime:
+                value = value.isoformat() if value else None
+            result[key] = value
+        return result
+
+    return to_dict
+
+def select_dicts(db, model, *criteria, order_by=()):
+    """
+    Rows of model matching criteria as the same dicts column_serializer's to_dict returns, read with a
+    Core SELECT so list endpoints don't build (and identity-map) an ORM instance per row.
+    """
+    table = model.__table__
+    datetime_keys = [column.key for column in table.columns if isinstance(column.type, DateTime)]
+    rows = []
+    for row in db.session.execute(select(table).where(*criteria).order_by(*order_by)).mappings():
+        row = dict(row)
+        for key in datetime_keys:
+            value = row[key]
+            row[key] = value.isoformat() if value else None
+        rows.append(row)
+    return rows
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite (dev / small deploys): WAL journal with NORMAL sync so commits don't fsync every write"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-64000')  # 64 MB page cache
+    cursor.execute('PRAGMA mmap_size=268435456')  # 256 MB
+    cursor.close()
 
 # This will be imported by app.py after db is initialized
 def create_models(db):
@@ -21,21 +89,6 @@ def create_models(db):
         vendor_name = Column(String(255), nullable=True)
         receipt_date = Column(DateTime, nullable=True)
         processed_data = Column(Text, nullable=True)  # JSON string of processed data
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'filename': self.filename,
-                'file_path': self.file_path,
-                'status': self.status,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-                'total_amount': self.total_amount,
-                'vendor_name': self.vendor_name,
-                'receipt_date': self.receipt_date.isoformat() if self.receipt_date else None,
-                'processed_data': self.processed_data
-            }
 
     class ProcessingJob(db.Model):
         """Model for tracking processing jobs"""
@@ -53,21 +106,6 @@ def create_models(db):
         input_files = Column(Text, nullable=True)  # JSON string of input file paths
         output_files = Column(Text, nullable=True)  # JSON string of output file paths
         job_config = Column(Text, nullable=True)  # JSON string of job configuration
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'job_name': self.job_name,
-                'status': self.status,
-                'started_at': self.started_at.isoformat() if self.started_at else None,
-                'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-                'error_message': self.error_message,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'input_files': self.input_files,
-                'output_files': self.output_files,
-                'job_config': self.job_config
-            }
     
     class Subsidiary(db.Model):
         """Model for storing subsidiary information"""
@@ -79,21 +117,14 @@ def create_models(db):
         region = Column(String(100), nullable=True)
         is_active = Column(Boolean, default=True)
         created_at = Column(DateTime, default=datetime.utcnow)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'name': self.name,
-                'code': self.code,
-                'region': self.region,
-                'is_active': self.is_active,
-                'created_at': self.created_at.isoformat() if self.created_at else None
-            }
     
     class StripeTransaction(db.Model):
         """Model for storing Stripe transaction data from CSV uploads"""
         __tablename__ = 'stripe_transactions'
+        __table_args__ = (
+            # Stripe rows are always loaded, matched and cleared per job/subsidiary
+            Index('ix_stripe_transactions_job_sub', 'job_id', 'subsidiary_id'),
+        )
         
         id = Column(Integer, primary_key=True)
         subsidiary_id = Column(Integer, nullable=False)  # Link to subsidiary
@@ -122,38 +153,14 @@ def create_models(db):
         # Metadata
         uploaded_at = Column(DateTime, default=datetime.utcnow)
         filename = Column(String(255), nullable=True)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'subsidiary_id': self.subsidiary_id,
-                'job_id': self.job_id,
-                'client_number': self.client_number,
-                'description_client_id': self.description_client_id,
-                'type': self.type,
-                'stripe_id': self.stripe_id,
-                'created': self.created,
-                'description': self.description,
-                'amount': self.amount,
-                'currency': self.currency,
-                'converted_amount': self.converted_amount,
-                'fees': self.fees,
-                'net': self.net,
-                'converted_currency': self.converted_currency,
-                'details': self.details,
-                'customer_id': self.customer_id,
-                'customer_email': self.customer_email,
-                'customer_name': self.customer_name,
-                'purpose_metadata': self.purpose_metadata,
-                'phorest_client_id_metadata': self.phorest_client_id_metadata,
-                'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
-                'filename': self.filename
-            }
     
     class CashbookTransaction(db.Model):
         """Model for storing Cashbook transaction data from Excel uploads"""
         __tablename__ = 'cashbook_transactions'
+        __table_args__ = (
+            # Cashbook rows are always loaded, matched and cleared per job/subsidiary
+            Index('ix_cashbook_transactions_job_sub', 'job_id', 'subsidiary_id'),
+        )
         
         id = Column(Integer, primary_key=True)
         subsidiary_id = Column(Integer, nullable=False)  # Link to subsidiary
@@ -182,41 +189,13 @@ def create_models(db):
         # Metadata
         uploaded_at = Column(DateTime, default=datetime.utcnow)
         filename = Column(String(255), nullable=True)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'subsidiary_id': self.subsidiary_id,
-                'job_id': self.job_id,
-                'payment_date': self.payment_date,  # Already a string in dd/mm/yyyy format
-                'client_id': self.client_id,
-                'invoice_number': self.invoice_number,
-                'billing_entity': self.billing_entity,
-                'ar_account': self.ar_account,
-                'currency': self.currency,
-                'exchange_rate': self.exchange_rate,
-                'amount': self.amount,
-                'account': self.account,
-                'location': self.location,
-                'transtype': self.transtype,
-                'comment': self.comment,
-                'card_reference': self.card_reference,
-                'reasoncode': self.reasoncode,
-                'sepaprovider': self.sepaprovider,
-                'invoice_hash': self.invoice_hash,
-                'payment_hash': self.payment_hash,
-                'memo': self.memo,
-                'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
-                'filename': self.filename
-            }
     
     class LookerCashbookTransaction(db.Model):
         """Model for storing Looker Cashbook transaction data from Excel uploads"""
         __tablename__ = 'looker_cashbook_transactions'
         
         id = Column(Integer, primary_key=True)
-        job_id = Column(Integer, nullable=False)  # Link to reconciliation job
+        job_id = Column(Integer, nullable=False, index=True)  # Link to reconciliation job
         
         # All 16 columns from cashbookraw.xlsx
         unnamed_index = Column(Integer, nullable=True)  # Unnamed: 0 column
@@ -239,35 +218,19 @@ def create_models(db):
         # Metadata
         uploaded_at = Column(DateTime, default=datetime.utcnow)
         filename = Column(String(255), nullable=True)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'job_id': self.job_id,
-                'unnamed_index': self.unnamed_index,
-                'payment_date': self.payment_date,  # Already a string in dd/mm/yyyy format
-                'client_id': self.client_id,
-                'invoice_number': self.invoice_number,
-                'billing_entity': self.billing_entity,
-                'ar_account': self.ar_account,
-                'currency': self.currency,
-                'exchange_rate': self.exchange_rate,
-                'amount': self.amount,
-                'account': self.account,
-                'location': self.location,
-                'transtype': self.transtype,
-                'comment': self.comment,
-                'reasoncode': self.reasoncode,
-                'sepa_provider': self.sepa_provider,
-                'stripe_charge_id': self.stripe_charge_id,
-                'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
-                'filename': self.filename
-            }
 
     class MatchedTransaction(db.Model):
         """Model for storing matched transactions with ALL columns from BOTH Cashbook AND Stripe files"""
         __tablename__ = 'matched_transactions'
+        __table_args__ = (
+            # Support the NOT EXISTS anti-joins used to find unmatched Stripe/Cashbook rows
+            Index('ix_matched_transactions_job_sub_stripe', 'job_id', 'subsidiary_id', 'stripe_id'),
+            Index('ix_matched_transactions_job_sub_cashbook', 'job_id', 'subsidiary_id', 'cashbook_id'),
+            # Journal sync scans a job/subsidiary and excludes Salon Summit Installments by match type
+            Index('ix_matched_transactions_job_sub_type', 'job_id', 'subsidiary_id', 'match_type'),
+            # Duplicate checks, clears and results look up a job/subsidiary's matches by process (and type)
+            Index('ix_matched_transactions_job_sub_process', 'job_id', 'subsidiary_id', 'process_number', 'match_type'),
+        )
         
         id = Column(Integer, primary_key=True)
         job_id = Column(Integer, nullable=False)
@@ -318,57 +281,6 @@ def create_models(db):
         match_type = Column(String(50), nullable=False)  # 'perfect', 'date_amount', etc.
         process_number = Column(Integer, nullable=False)  # 1, 2, or 3
         created_at = Column(DateTime, default=datetime.utcnow)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'job_id': self.job_id,
-                'subsidiary_id': self.subsidiary_id,
-                # Cashbook columns
-                'cashbook_id': self.cashbook_id,
-                'cb_payment_date': self.cb_payment_date,
-                'cb_client_id': self.cb_client_id,
-                'cb_invoice_number': self.cb_invoice_number,
-                'cb_billing_entity': self.cb_billing_entity,
-                'cb_ar_account': self.cb_ar_account,
-                'cb_currency': self.cb_currency,
-                'cb_exchange_rate': self.cb_exchange_rate,
-                'cb_amount': self.cb_amount,
-                'cb_account': self.cb_account,
-                'cb_location': self.cb_location,
-                'cb_transtype': self.cb_transtype,
-                'cb_comment': self.cb_comment,
-                'cb_card_reference': self.cb_card_reference,
-                'cb_reasoncode': self.cb_reasoncode,
-                'cb_sepaprovider': self.cb_sepaprovider,
-                'cb_invoice_hash': self.cb_invoice_hash,
-                'cb_payment_hash': self.cb_payment_hash,
-                'cb_memo': self.cb_memo,
-                # Stripe columns
-                'stripe_id': self.stripe_id,
-                'stripe_client_number': self.stripe_client_number,
-                'stripe_type': self.stripe_type,
-                'stripe_stripe_id': self.stripe_stripe_id,
-                'stripe_created': self.stripe_created,
-                'stripe_description': self.stripe_description,
-                'stripe_amount': self.stripe_amount,
-                'stripe_currency': self.stripe_currency,
-                'stripe_converted_amount': self.stripe_converted_amount,
-                'stripe_fees': self.stripe_fees,
-                'stripe_net': self.stripe_net,
-                'stripe_converted_currency': self.stripe_converted_currency,
-                'stripe_details': self.stripe_details,
-                'stripe_customer_id': self.stripe_customer_id,
-                'stripe_customer_email': self.stripe_customer_email,
-                'stripe_customer_name': self.stripe_customer_name,
-                'stripe_purpose_metadata': self.stripe_purpose_metadata,
-                'stripe_phorest_client_id_metadata': self.stripe_phorest_client_id_metadata,
-                # Metadata
-                'match_type': self.match_type,
-                'process_number': self.process_number,
-                'created_at': self.created_at.isoformat() if self.created_at else None
-            }
     
     class ReconciliationResults(db.Model):
         """Model for storing reconciliation process results and metadata"""
@@ -392,24 +304,6 @@ def create_models(db):
         
         created_at = Column(DateTime, default=datetime.utcnow)
         updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'job_id': self.job_id,
-                'subsidiary_id': self.subsidiary_id,
-                'process_number': self.process_number,
-                'cutoff_date': self.cutoff_date,
-                'unmatched_stripe_count': self.unmatched_stripe_count,
-                'unmatched_cashbook_count': self.unmatched_cashbook_count,
-                'out_of_cutoff_count': self.out_of_cutoff_count,
-                'multiple_matches_count': self.multiple_matches_count,
-                'unmatched_stripe_p2_count': self.unmatched_stripe_p2_count,
-                'unmatched_cashbook_p2_count': self.unmatched_cashbook_p2_count,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'updated_at': self.updated_at.isoformat() if self.updated_at else None
-            }
     
     class JournalTransaction(db.Model):
         """
@@ -418,6 +312,10 @@ def create_models(db):
         Journal data changes → Original data NEVER affected
         """
         __tablename__ = 'journal_transactions'
+        __table_args__ = (
+            # Journal sync looks up existing rows by job/subsidiary and matched transaction
+            Index('ix_journal_transactions_job_sub_matched', 'job_id', 'subsidiary_id', 'matched_transaction_id'),
+        )
         
         id = Column(Integer, primary_key=True)
         job_id = Column(Integer, nullable=False)
@@ -474,26 +372,14 @@ def create_models(db):
         created_at = Column(DateTime, default=datetime.utcnow)
         updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
         last_synced_at = Column(DateTime, nullable=True)  # When last synced from original
-        
-        def to_dict(self):
-            """Convert model to dictionary for JSON serialization"""
-            return {
-                'id': self.id,
-                'job_id': self.job_id,
-                'subsidiary_id': self.subsidiary_id,
-                'matched_transaction_id': self.matched_transaction_id,
-                'journal_type': self.journal_type,
-                'journal_memo': self.journal_memo,
-                'journal_invoice_number': self.journal_invoice_number,
-                'journal_payment_number': self.journal_payment_number,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-                'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None
-            }
     
     class FPDataset(db.Model):
         """Further Processing dataset state per job/subsidiary"""
         __tablename__ = 'fp_datasets'
+        __table_args__ = (
+            # Every further processing request starts by finding the job/subsidiary dataset
+            Index('ix_fp_datasets_job_sub', 'job_id', 'subsidiary_id'),
+        )
         id = Column(Integer, primary_key=True)
         job_id = Column(Integer, nullable=False)
         subsidiary_id = Column(Integer, nullable=False)
@@ -506,6 +392,13 @@ def create_models(db):
     class FPJournalRow(db.Model):
         """Rows uploaded for further processing (from Main/POA/Cross journals)"""
         __tablename__ = 'fp_journal_rows'
+        __table_args__ = (
+            # Journal rows are always read per dataset, and grouped or matched by client
+            Index('ix_fp_journal_rows_dataset_client', 'dataset_id', 'client_id'),
+            # Upload checks and status counts filter a dataset by journal type
+            Index('ix_fp_journal_rows_dataset_type', 'dataset_id', 'journal_type'),
+        )
+        
         id = Column(Integer, primary_key=True)
         dataset_id = Column(Integer, nullable=False)
         job_id = Column(Integer, nullable=False)
@@ -513,7 +406,7 @@ def create_models(db):
         journal_type = Column(String(50), nullable=False)  # Main, POA, Cross_Subsidiary
         client_id = Column(String(100), nullable=True)
         invoice_number = Column(String(255), nullable=True)
-        amount = Column(Float, nullable=True)
+        amount = Column(Float, nullable=False, default=0, server_default='0')
         row_json = Column(Text, nullable=True)  # raw row as JSON string
         filename = Column(String(255), nullable=True)
         uploaded_at = Column(DateTime, default=datetime.utcnow)
@@ -522,7 +415,7 @@ def create_models(db):
         """Combined working table for Further Processing (materialized from uploads)"""
         __tablename__ = 'fp_working_rows'
         id = Column(Integer, primary_key=True)
-        dataset_id = Column(Integer, nullable=False)
+        dataset_id = Column(Integer, nullable=False, index=True)
         job_id = Column(Integer, nullable=False)
         subsidiary_id = Column(Integer, nullable=False)
         source_journal_type = Column(String(50), nullable=False)
@@ -535,6 +428,11 @@ def create_models(db):
     class FPSummitInstallment(db.Model):
         """Summit installment data - persistent storage"""
         __tablename__ = 'fp_summit_installments'
+        __table_args__ = (
+            # Installments are summed per client within a dataset
+            Index('ix_fp_summit_installments_dataset_client', 'dataset_id', 'client_id'),
+        )
+        
         id = Column(Integer, primary_key=True)
         dataset_id = Column(Integer, nullable=False)
         job_id = Column(Integer, nullable=False)
@@ -547,6 +445,13 @@ def create_models(db):
     class FPProcessedJournal(db.Model):
         """Processed journals after summit split - persistent storage"""
         __tablename__ = 'fp_processed_journals'
+        __table_args__ = (
+            # Processed journals are counted, totalled and downloaded per dataset and journal type
+            Index('ix_fp_processed_journals_dataset_type', 'dataset_id', 'journal_type'),
+            # Summit processing looks processed rows up by client within a dataset
+            Index('ix_fp_processed_journals_dataset_client', 'dataset_id', 'client_id'),
+        )
+        
         id = Column(Integer, primary_key=True)
         dataset_id = Column(Integer, nullable=False)
         job_id = Column(Integer, nullable=False)
@@ -554,13 +459,18 @@ def create_models(db):
         journal_type = Column(String(50), nullable=False)  # Main, POA, Cross_Subsidiary, Salon_Summit_Installments
         client_id = Column(String(100), nullable=True)
         invoice_number = Column(String(255), nullable=True)
-        amount = Column(Float, nullable=True)
+        amount = Column(Float, nullable=False, default=0, server_default='0')
         row_json = Column(Text, nullable=True)
         created_at = Column(DateTime, default=datetime.utcnow)
 
     class FPMatchResult(db.Model):
         """Summit matching results - stores all match outcomes"""
         __tablename__ = 'fp_match_results'
+        __table_args__ = (
+            # Match results are listed and downloaded per dataset and match status
+            Index('ix_fp_match_results_dataset_status', 'dataset_id', 'match_status'),
+        )
+        
         id = Column(Integer, primary_key=True)
         dataset_id = Column(Integer, nullable=False)
         job_id = Column(Integer, nullable=False)
@@ -579,7 +489,7 @@ def create_models(db):
         """EU-specific dataset for journal processing"""
         __tablename__ = 'fp_datasets_eu'
         id = Column(Integer, primary_key=True)
-        job_id = Column(Integer, nullable=False)
+        job_id = Column(Integer, nullable=False, index=True)
         status = Column(String(50), default='loaded')  # loaded, committed
         created_at = Column(DateTime, default=datetime.utcnow)
         updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -635,6 +545,15 @@ def create_models(db):
         row_json = Column(Text)
         created_at = Column(DateTime, default=datetime.utcnow)
 
+    # JSON API serializers
+    for model in (Receipt, ProcessingJob, Subsidiary, StripeTransaction, CashbookTransaction,
+                  LookerCashbookTransaction, MatchedTransaction, ReconciliationResults):
+        model.to_dict = column_serializer(model)
+    # Journal rows expose only their own journal fields; the copied matched columns are not returned
+    JournalTransaction.to_dict = column_serializer(JournalTransaction, [
+        'id', 'job_id', 'subsidiary_id', 'matched_transaction_id', 'journal_type', 'journal_memo',
+        'journal_invoice_number', 'journal_payment_number', 'created_at', 'updated_at', 'last_synced_at'])
+
     return (Receipt, ProcessingJob, Subsidiary, StripeTransaction, CashbookTransaction,
             LookerCashbookTransaction, MatchedTransaction, ReconciliationResults, JournalTransaction,
             FPDataset, FPJournalRow, FPWorkingRow, FPSummitInstallment, FPProcessedJournal, FPMatchResult,